@@ -2,35 +2,51 @@ import tkinter as tk
 from tkinter import messagebox, ttk, scrolledtext
 import cv2
 import os
-import face_recognition
-import pickle
-import sqlite3
+import threading
+import time
 import numpy as np
-import pandas as pd
-from datetime import datetime, date
-from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from datetime import datetime
+
+import settings
+import attendance_db
+import dashboard
+import liveness
+import recognition
+import report_cache
+import reports
+import metrics
+import snapshot
+from detectors import create_detector
+from preprocess import FramePreprocessor, configure_capture
 
 # ---------- Setup Folders ----------
-os.makedirs("data/students", exist_ok=True)
-os.makedirs("encodings", exist_ok=True)
-os.makedirs("database", exist_ok=True)
+os.makedirs(settings.STUDENTS_DIR, exist_ok=True)
+os.makedirs(os.path.dirname(settings.ENCODINGS_PATH) or ".", exist_ok=True)
 
 # ---------- Database Setup ----------
-conn = sqlite3.connect("database/attendance.db")
-c = conn.cursor()
-c.execute("""CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT,
-                name TEXT,
-                date TEXT,
-                time TEXT,
-                status TEXT)""")
-conn.commit()
+attendance_db.init_db()
+if settings.AUTO_ARCHIVE:
+    attendance_db.archive_old_partitions()
+
+# ---------- Warm Start ----------
+# Face index, student keys, roster and today's present set from the snapshot,
+# rebuilt from the encodings file and the database only when they changed
+conn = attendance_db.connect()
+warm = snapshot.warm_start(conn)
 conn.close()
 
+def preload_face_recognition():
+    """dlib's models take seconds to load, import them while the window comes up"""
+    try:
+        import face_recognition  # noqa: F401
+    except ImportError:
+        pass
+
+threading.Thread(target=preload_face_recognition, name="preload", daemon=True).start()
+
+# ---------- Metrics ----------
+metrics.start()
+
 # ---------- Helper Functions ----------
 def validate_input(name, student_id):
     """Validate student name and ID input"""
@@ -50,8 +66,8 @@ def register_student(name, student_id):
     if not validate_input(name, student_id):
         return
     
-    folder_path = f"data/students/{student_id}_{name}"
-    if os.path.exists(folder_path):
+    folder_path = os.path.join(settings.STUDENTS_DIR, f"{student_id}_{name}")
+    if student_id in warm.roster or os.path.exists(folder_path):
         messagebox.showerror("Error", f"Student {student_id} already exists!")
         return
     
@@ -91,6 +107,11 @@ def register_student(name, student_id):
     cv2.destroyAllWindows()
     
     if count > 0:
+        conn = attendance_db.connect()
+        key, = attendance_db.ensure_students(conn, [(student_id, name)])
+        conn.close()
+        warm.roster.add(student_id, key, name)
+        dashboard.publish(dashboard.REGISTERED, key)
         messagebox.showinfo("Success", f"Student {name} registered with {count} images!")
     else:
         os.rmdir(folder_path)
@@ -98,7 +119,13 @@ def register_student(name, student_id):
 
 def encode_faces():
     """Generate face encodings for all registered students"""
-    students_dir = "data/students/"
+    try:
+        import face_recognition
+    except ImportError as e:
+        messagebox.showerror("Error", f"Cannot load face recognition: {str(e)}")
+        return
+
+    students_dir = settings.STUDENTS_DIR
     if not os.path.exists(students_dir) or not os.listdir(students_dir):
         messagebox.showerror("Error", "No students registered yet!")
         return
@@ -145,101 +172,186 @@ def encode_faces():
         progress_var.set((processed / total_students) * 100)
         progress_window.update()
 
-    with open("encodings/encodings.pkl", "wb") as f:
-        pickle.dump(encodings, f)
+    recognition.save_encodings(encodings)
     
     progress_window.destroy()
     messagebox.showinfo("Success", f"Encodings generated for {len(encodings)} students!")
 
+# finish() of the running attendance loop, so closing the window can release the cameras
+stop_marking = None
+
 def mark_attendance():
     """Mark attendance using face recognition"""
+    global stop_marking
     try:
-        with open("encodings/encodings.pkl", "rb") as f:
-            encodings_dict = pickle.load(f)
-    except FileNotFoundError:
-        messagebox.showerror("Error", "No encodings found! Encode faces first.")
+        import face_recognition
+    except ImportError as e:
+        messagebox.showerror("Error", f"Cannot load face recognition: {str(e)}")
         return
 
-    if not encodings_dict:
-        messagebox.showerror("Error", "No student encodings available!")
+    conn = attendance_db.connect()
+    # Picks up new encodings, students and marks since the last refresh
+    warm.refresh(conn)
+    matcher = warm.matcher
+    if matcher is None:
+        conn.close()
+        messagebox.showerror("Error", "No encodings found! Encode faces first.")
         return
 
-    known_face_names = list(encodings_dict.keys())
-    known_face_encodings = list(encodings_dict.values())
-
-    conn = sqlite3.connect("database/attendance.db")
-    c = conn.cursor()
-
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        messagebox.showerror("Error", "Cannot access camera!")
+    try:
+        detector = create_detector()
+    except (ImportError, FileNotFoundError, ValueError) as e:
         conn.close()
+        messagebox.showerror("Error", f"Cannot start face detector: {str(e)}")
         return
+
+    # Integer student keys in matcher order
+    student_keys = warm.student_keys
+
+    cameras = []
+    for source in settings.CAMERA_SOURCES:
+        cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        if not cap.isOpened():
+            messagebox.showerror("Error", f"Cannot access camera {source}!")
+            for other in cameras:
+                other.release()
+            conn.close()
+            return
+        configure_capture(cap)
+        cameras.append(cap)
+    # One set of reused frame buffers per camera
+    preprocessors = [FramePreprocessor(detector.color) for _ in cameras]
+    liveness_checker = liveness.LivenessChecker()
     
     messagebox.showinfo("Info", "Attendance marking started. Press 'q' to quit")
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    # Frames run as Tk callbacks, keep the other camera actions out until marking stops
+    for button in (reg_btn, encode_btn, attendance_btn):
+        button.config(state='disabled')
+    after_id = None
+
+    def finish(completed=True):
+        """Release the cameras and the database, called on 'q', a lost camera or closing the window"""
+        global stop_marking
+        stop_marking = None
+        if after_id is not None:
+            root.after_cancel(after_id)
+        for cap in cameras:
+            cap.release()
+        cv2.destroyAllWindows()
+        conn.close()
+        for button in (reg_btn, encode_btn, attendance_btn):
+            button.config(state='normal')
+        if completed:
+            messagebox.showinfo("Info", "Attendance marking completed!")
+
+    def process_frame():
+        """One frame from every camera, False once marking should stop"""
+        frame_start = time.perf_counter()
+        frames = []
+        with metrics.timer("capture"):
+            for cap, preprocessor in zip(cameras, preprocessors):
+                ret, frame = preprocessor.read(cap)
+                if not ret:
+                    return False
+                frames.append(frame)
+        metrics.inc("frames", len(frames))
         
-        # Resize frame for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-            name = "Unknown"
-            student_id = ""
-            
-            face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-            best_match_index = np.argmin(face_distances)
-            
-            if matches[best_match_index] and face_distances[best_match_index] < 0.6:
-                name = known_face_names[best_match_index]
-                student_id = name.split("_")[0]
-
-                today = datetime.now().date()
-                c.execute("SELECT * FROM attendance WHERE student_id=? AND date=?", (student_id, str(today)))
-                if not c.fetchall():
-                    c.execute("INSERT INTO attendance (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
-                              (student_id, name, str(today), str(datetime.now().time())[:8], "Present"))
-                    conn.commit()
-                    print(f"{name} marked present at {datetime.now().time()}")
-
-            # Scale back up face locations
-            top, right, bottom, left = face_location
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-            
-            # Draw rectangle and label
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, name, (left, top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-        # Add instructions on frame
-        cv2.putText(frame, "Press 'q' to quit", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        cv2.imshow("Attendance System", frame)
+        # Downscale into each camera's reused buffers, in the colour layout the detector wants
+        with metrics.timer("preprocess"):
+            detector_inputs = [preprocessor.process(frame) for preprocessor, frame in zip(preprocessors, frames)]
+
+        # Detect faces on all cameras in one batch
+        with metrics.timer("detection"):
+            batch_locations = detector.detect_batch(detector_inputs)
+
+        for camera_index, (frame, preprocessor, face_locations) in enumerate(zip(frames, preprocessors, batch_locations)):
+            metrics.inc("faces_detected", len(face_locations))
+            face_encodings = []
+            if face_locations:
+                with metrics.timer("encoding"):
+                    face_encodings = face_recognition.face_encodings(preprocessor.rgb(), face_locations)
+
+            # Labels are drawn after all faces are checked, the liveness crop needs the undrawn frame
+            labels = []
+            for face_encoding, face_location in zip(face_encodings, face_locations):
+                name = "Unknown"
+                
+                with metrics.timer("matching"):
+                    best_match_index, _ = matcher.match(face_encoding)
+                
+                if best_match_index is not None:
+                    metrics.inc("faces_recognized")
+                    name = matcher.names[best_match_index]
+                    student = student_keys[best_match_index]
+
+                    with metrics.timer("db_check"):
+                        already_marked = warm.is_present(conn, student)
+                    verdict = liveness.LIVE
+                    if not already_marked:
+                        # Only new candidates pay for the anti-spoof check
+                        verdict = liveness_checker.check((camera_index, student), frame,
+                                                         preprocessor.to_frame(face_location),
+                                                         preprocessor.rgb(), face_location)
+                        if verdict == liveness.SPOOF:
+                            name = f"{name} (not live)"
+                        elif verdict == liveness.PENDING:
+                            name = f"{name} (checking)"
+                    if not already_marked and verdict == liveness.LIVE:
+                        with metrics.timer("db_insert"):
+                            attendance_db.mark_present(conn, student)
+                        warm.mark(student)
+                        metrics.inc("attendance_marked")
+                        dashboard.publish(dashboard.MARKED, student, f"Camera {settings.CAMERA_SOURCES[camera_index]}")
+                        print(f"{name} marked present at {datetime.now().time()}")
+                else:
+                    metrics.inc("faces_unknown")
+                labels.append((face_location, name))
+
+            display_frame = preprocessor.display(frame)
+            with metrics.timer("render"):
+                for face_location, name in labels:
+                    # Scale face locations up to the displayed frame
+                    top, right, bottom, left = preprocessor.to_display(face_location)
+
+                    # Draw rectangle and label
+                    cv2.rectangle(display_frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                    cv2.putText(display_frame, name, (left, top-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+
+                # Add instructions on frame
+                cv2.putText(display_frame, "Press 'q' to quit", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+                window_name = "Attendance System" if len(cameras) == 1 else f"Attendance System - Camera {camera_index + 1}"
+                cv2.imshow(window_name, display_frame)
         
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    conn.close()
-    messagebox.showinfo("Info", "Attendance marking completed!")
+        with metrics.timer("render"):
+            key = cv2.waitKey(1) & 0xFF
+        metrics.observe("frame", time.perf_counter() - frame_start)
+        return key != ord('q')
+
+    def step():
+        nonlocal after_id
+        after_id = None
+        try:
+            running = process_frame()
+        except Exception:
+            finish(completed=False)
+            raise
+        if running:
+            # Between frames the Tk loop runs the live dashboard and window events
+            after_id = root.after(1, step)
+        else:
+            finish()
+
+    stop_marking = finish
+    step()
 
 def view_attendance():
     """Display attendance records in a new window"""
-    conn = sqlite3.connect("database/attendance.db")
+    conn = attendance_db.connect()
     
     # Get attendance data
-    df = pd.read_sql_query("SELECT * FROM attendance ORDER BY date DESC, time DESC", conn)
+    df = report_cache.cache.attendance(conn, *report_range())
     conn.close()
+    show_report_cache_stats()
     
     if df.empty:
         messagebox.showinfo("Info", "No attendance records found!")
@@ -251,10 +363,9 @@ def view_attendance():
     view_window.geometry("800x600")
     
     # Create treeview
-    tree = ttk.Treeview(view_window, columns=('ID', 'Student_ID', 'Name', 'Date', 'Time', 'Status'), show='headings')
+    tree = ttk.Treeview(view_window, columns=('Student_ID', 'Name', 'Date', 'Time', 'Status'), show='headings')
     
     # Define headings
-    tree.heading('ID', text='ID')
     tree.heading('Student_ID', text='Student ID')
     tree.heading('Name', text='Name')
     tree.heading('Date', text='Date')
@@ -262,16 +373,15 @@ def view_attendance():
     tree.heading('Status', text='Status')
     
     # Configure column widths
-    tree.column('ID', width=50)
     tree.column('Student_ID', width=100)
-    tree.column('Name', width=200)
+    tree.column('Name', width=250)
     tree.column('Date', width=100)
     tree.column('Time', width=100)
     tree.column('Status', width=80)
     
     # Insert data
     for index, row in df.iterrows():
-        tree.insert('', 'end', values=(row['id'], row['student_id'], row['name'], row['date'], row['time'], row['status']))
+        tree.insert('', 'end', values=(row['student_id'], row['name'], row['date'], row['time'], row['status']))
     
     # Add scrollbar
     scrollbar = ttk.Scrollbar(view_window, orient='vertical', command=tree.yview)
@@ -283,28 +393,32 @@ def view_attendance():
 
 def export_to_excel():
     """Export attendance data to Excel file"""
-    conn = sqlite3.connect("database/attendance.db")
-    df = pd.read_sql_query("SELECT * FROM attendance ORDER BY date DESC, time DESC", conn)
-    conn.close()
+    conn = attendance_db.connect()
+    df = report_cache.cache.attendance(conn, *report_range())
     
     if df.empty:
+        conn.close()
         messagebox.showinfo("Info", "No attendance records to export!")
         return
     
     try:
-        filename = f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        df.to_excel(filename, index=False)
+        filename = reports.export_filename()
+        report_cache.cache.export(conn, filename, *report_range(), with_students=False)
         messagebox.showinfo("Success", f"Attendance data exported to {filename}")
     except Exception as e:
         messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+    finally:
+        conn.close()
+        show_report_cache_stats()
 
 def generate_statistics():
     """Generate and display attendance statistics"""
-    conn = sqlite3.connect("database/attendance.db")
-    df = pd.read_sql_query("SELECT * FROM attendance", conn)
+    conn = attendance_db.connect()
+    report = report_cache.cache.statistics(conn, *report_range())
     conn.close()
+    show_report_cache_stats()
     
-    if df.empty:
+    if report is None:
         messagebox.showinfo("Info", "No attendance data available!")
         return
     
@@ -313,48 +427,29 @@ def generate_statistics():
     stats_window.title("Attendance Statistics")
     stats_window.geometry("600x400")
     
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'])
-    
     # Create statistics text
     stats_text = scrolledtext.ScrolledText(stats_window, wrap=tk.WORD, width=70, height=20)
     stats_text.pack(fill='both', expand=True, padx=10, pady=10)
     
-    # Calculate statistics
-    total_records = len(df)
-    unique_students = df['student_id'].nunique()
-    date_range = f"{df['date'].min().date()} to {df['date'].max().date()}"
-    
-    # Daily attendance count
-    daily_stats = df.groupby('date').size().describe()
-    
-    # Student attendance frequency
-    student_stats = df.groupby(['student_id', 'name']).size().sort_values(ascending=False)
-    
-    # Generate report text
-    report = f"""
-ATTENDANCE STATISTICS REPORT
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-OVERVIEW:
-Total attendance records: {total_records}
-Unique students: {unique_students}
-Date range: {date_range}
-
-DAILY ATTENDANCE STATISTICS:
-Average daily attendance: {daily_stats['mean']:.2f}
-Maximum daily attendance: {daily_stats['max']:.0f}
-Minimum daily attendance: {daily_stats['min']:.0f}
-
-STUDENT ATTENDANCE FREQUENCY:
-"""
-    
-    for (student_id, name), count in student_stats.head(10).items():
-        report += f"{name} ({student_id}): {count} days\n"
-    
     stats_text.insert(tk.END, report)
     stats_text.config(state=tk.DISABLED)
 
+def live_dashboard():
+    """Open the live dashboard, updated as students are marked"""
+    dashboard.open_dashboard(root, len(warm.roster))
+
+def show_report_cache_stats():
+    """Report cache hit/miss counts in the status bar"""
+    stats = report_cache.cache.stats()
+    status_label.config(text=f"Ready | Report cache: {stats['hits']} hits, {stats['misses']} misses, "
+                             f"{stats['bytes'] / 1024 / 1024:.1f} MB")
+
+def report_range():
+    """Date range for the reports: the current term unless previous terms are included"""
+    if history_var.get():
+        return None, None
+    return attendance_db.current_term_range()
+
 # ---------- Tkinter GUI ----------
 root = tk.Tk()
 root.title("Face Recognition Attendance Management System")
@@ -428,6 +523,11 @@ reports_frame = tk.LabelFrame(main_frame, text="📊 Reports & Data Management",
                              bg='#f0f0f0', fg='#2c3e50', padx=20, pady=15)
 reports_frame.pack(fill='x', pady=(0, 15))
 
+history_var = tk.BooleanVar(value=False)
+history_check = tk.Checkbutton(reports_frame, text="Include previous terms (archived)", variable=history_var,
+                               font=("Arial", 10), bg='#f0f0f0')
+history_check.pack(anchor='w')
+
 view_btn = tk.Button(reports_frame, text="👀 View Attendance Records", command=view_attendance,
                     font=("Arial", 11, "bold"), bg='#8e44ad', fg='white', 
                     padx=15, pady=8, cursor='hand2')
@@ -438,6 +538,11 @@ stats_btn = tk.Button(reports_frame, text="📈 Generate Statistics", command=ge
                      padx=15, pady=8, cursor='hand2')
 stats_btn.pack(fill='x', pady=5)
 
+dashboard_btn = tk.Button(reports_frame, text="📡 Live Dashboard", command=live_dashboard,
+                         font=("Arial", 11, "bold"), bg='#16a085', fg='white', 
+                         padx=15, pady=8, cursor='hand2')
+dashboard_btn.pack(fill='x', pady=5)
+
 export_btn = tk.Button(reports_frame, text="📤 Export to Excel", command=export_to_excel,
                       font=("Arial", 11, "bold"), bg='#34495e', fg='white', 
                       padx=15, pady=8, cursor='hand2')
@@ -469,4 +574,24 @@ instructions_label = tk.Label(instructions_frame, text=instructions_text,
                              justify='left', wraplength=500)
 instructions_label.pack(anchor='w')
 
+def save_snapshot():
+    """Bring the warm-start snapshot up to date (written only if something changed)"""
+    conn = attendance_db.connect()
+    warm.refresh(conn)
+    conn.close()
+    warm.save()
+
+def snapshot_timer():
+    save_snapshot()
+    root.after(int(settings.SNAPSHOT_INTERVAL * 1000), snapshot_timer)
+
+def on_close():
+    if stop_marking is not None:
+        stop_marking(completed=False)
+    save_snapshot()
+    root.destroy()
+
+if settings.SNAPSHOT_INTERVAL > 0:
+    root.after(int(settings.SNAPSHOT_INTERVAL * 1000), snapshot_timer)
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.mainloop()
@@ -1,38 +1,31 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, scrolledtext, filedialog
-import cv2
 import os
 import sqlite3
-import numpy as np
 import pandas as pd
-from datetime import datetime, date
-from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+import settings
+import attendance_db
+import dashboard
+import report_cache
+import reports
+from roster import AttendanceWriter, Roster
 
 # ---------- Setup Folders ----------
-os.makedirs("data/students", exist_ok=True)
-os.makedirs("database", exist_ok=True)
+os.makedirs(settings.STUDENTS_DIR, exist_ok=True)
 
 # ---------- Database Setup ----------
-conn = sqlite3.connect("database/attendance.db")
-c = conn.cursor()
-c.execute("""CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT,
-                name TEXT,
-                date TEXT,
-                time TEXT,
-                status TEXT)""")
-
-c.execute("""CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT UNIQUE,
-                name TEXT,
-                registered_date TEXT)""")
-conn.commit()
+attendance_db.init_db()
+if settings.AUTO_ARCHIVE:
+    attendance_db.archive_old_partitions()
+
+# ---------- Roster ----------
+# Student lookups and attendance marking from the GUI go through memory;
+# the writer thread saves the rows in the background
+conn = attendance_db.connect()
+roster = Roster.load(conn)
 conn.close()
+writer = AttendanceWriter()
 
 # ---------- Helper Functions ----------
 def validate_input(name, student_id):
@@ -52,14 +45,16 @@ def register_student(name, student_id):
     """Register a new student (manual entry for now)"""
     if not validate_input(name, student_id):
         return
+    if student_id in roster:
+        messagebox.showerror("Error", f"Student ID {student_id} already exists!")
+        return
     
-    conn = sqlite3.connect("database/attendance.db")
-    c = conn.cursor()
+    conn = attendance_db.connect()
     
     try:
-        c.execute("INSERT INTO students (student_id, name, registered_date) VALUES (?, ?, ?)",
-                  (student_id, name, str(datetime.now().date())))
-        conn.commit()
+        key = attendance_db.add_student(conn, student_id, name)
+        roster.add(student_id, key, name)
+        dashboard.publish(dashboard.REGISTERED, key)
         messagebox.showinfo("Success", f"Student {name} (ID: {student_id}) registered successfully!")
         
         # Clear the entry fields
@@ -86,8 +81,8 @@ def manual_attendance():
              font=("Arial", 16, "bold")).pack(pady=10)
     
     # Get list of students
-    conn = sqlite3.connect("database/attendance.db")
-    students_df = pd.read_sql_query("SELECT student_id, name FROM students ORDER BY name", conn)
+    conn = attendance_db.connect()
+    students_df = pd.read_sql_query("SELECT id, student_id, name FROM students ORDER BY name", conn)
     conn.close()
     
     if students_df.empty:
@@ -120,27 +115,12 @@ def manual_attendance():
             messagebox.showwarning("Warning", "Please select at least one student!")
             return
         
-        conn = sqlite3.connect("database/attendance.db")
-        c = conn.cursor()
-        today = str(datetime.now().date())
-        current_time = str(datetime.now().time())[:8]
-        
         marked_count = 0
         for index in selected_indices:
-            student_info = students_df.iloc[index]
-            student_id = student_info['student_id']
-            name = student_info['name']
-            
-            # Check if already marked today
-            c.execute("SELECT * FROM attendance WHERE student_id=? AND date=?", (student_id, today))
-            if not c.fetchall():
-                c.execute("INSERT INTO attendance (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
-                          (student_id, name, today, current_time, "Present"))
+            # Students already marked today are skipped
+            if writer.mark(int(students_df.iloc[index]['id']), camera="Manual"):
                 marked_count += 1
         
-        conn.commit()
-        conn.close()
-        
         messagebox.showinfo("Success", f"Marked {marked_count} students as present!")
         attendance_window.destroy()
     
@@ -149,10 +129,10 @@ def manual_attendance():
               bg='#27ae60', fg='white', padx=20, pady=10).pack(pady=20)
 
 def quick_attendance():
-    """Quick attendance by entering student IDs"""
+    """Quick attendance by entering or scanning student IDs"""
     quick_window = tk.Toplevel()
     quick_window.title("Quick Attendance")
-    quick_window.geometry("400x300")
+    quick_window.geometry("400x420")
     
     tk.Label(quick_window, text="Quick Attendance Entry", 
              font=("Arial", 16, "bold")).pack(pady=10)
@@ -163,60 +143,77 @@ def quick_attendance():
     id_entry_quick = tk.Entry(quick_window, font=("Arial", 12), width=20)
     id_entry_quick.pack(pady=5)
     
+    # Autocomplete suggestions for the typed prefix
+    suggestions = tk.Listbox(quick_window, height=5, font=("Arial", 10))
+    suggestions.pack(padx=20, fill='x')
+    
     result_text = scrolledtext.ScrolledText(quick_window, width=40, height=10)
     result_text.pack(pady=10, padx=20, fill='both', expand=True)
     
-    def mark_attendance_quick():
-        student_id = id_entry_quick.get().strip()
+    def mark_attendance_quick(student_id=None):
+        student_id = (student_id or id_entry_quick.get()).strip()
         if not student_id:
             messagebox.showwarning("Warning", "Please enter a student ID!")
             return
         
-        conn = sqlite3.connect("database/attendance.db")
-        c = conn.cursor()
-        
-        # Check if student exists
-        c.execute("SELECT name FROM students WHERE student_id=?", (student_id,))
-        student = c.fetchone()
-        
+        # Lookup and duplicate check are in memory, the row is written in the background
+        student = roster.get(student_id)
         if not student:
             result_text.insert(tk.END, f"❌ Student ID {student_id} not found!\n")
-            id_entry_quick.delete(0, tk.END)
-            conn.close()
-            return
-        
-        name = student[0]
-        today = str(datetime.now().date())
-        current_time = str(datetime.now().time())[:8]
-        
-        # Check if already marked today
-        c.execute("SELECT * FROM attendance WHERE student_id=? AND date=?", (student_id, today))
-        if c.fetchall():
-            result_text.insert(tk.END, f"⚠️ {name} ({student_id}) already marked today!\n")
         else:
-            c.execute("INSERT INTO attendance (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
-                      (student_id, name, today, current_time, "Present"))
-            conn.commit()
-            result_text.insert(tk.END, f"✅ {name} ({student_id}) marked present!\n")
+            student_key, name = student
+            if writer.mark(student_key, camera="Quick entry"):
+                result_text.insert(tk.END, f"✅ {name} ({student_id}) marked present!\n")
+                if writer.error:
+                    result_text.insert(tk.END, f"⚠️ Not saved yet, retrying: {writer.error}\n")
+            else:
+                result_text.insert(tk.END, f"⚠️ {name} ({student_id}) already marked today!\n")
         
-        conn.close()
         id_entry_quick.delete(0, tk.END)
+        suggestions.delete(0, tk.END)
         result_text.see(tk.END)
     
+    def update_suggestions(event):
+        if event.keysym in ('Return', 'Down', 'Up'):
+            return
+        suggestions.delete(0, tk.END)
+        prefix = id_entry_quick.get().strip()
+        if prefix:
+            for student_id, name in roster.complete(prefix):
+                suggestions.insert(tk.END, f"{student_id} - {name}")
+    
+    def pick_suggestion(event=None):
+        selection = suggestions.curselection()
+        if selection:
+            mark_attendance_quick(suggestions.get(selection[0]).split(" - ")[0])
+            id_entry_quick.focus()
+    
+    def focus_suggestions(event):
+        if suggestions.size():
+            suggestions.focus()
+            suggestions.selection_clear(0, tk.END)
+            suggestions.selection_set(0)
+            suggestions.activate(0)
+    
     tk.Button(quick_window, text="Mark Present", command=mark_attendance_quick,
               font=("Arial", 12, "bold"), bg='#3498db', fg='white').pack(pady=10)
     
-    # Allow Enter key to mark attendance
+    # Allow Enter key to mark attendance, Down arrow to pick a suggestion
     id_entry_quick.bind('<Return>', lambda event: mark_attendance_quick())
+    id_entry_quick.bind('<KeyRelease>', update_suggestions)
+    id_entry_quick.bind('<Down>', focus_suggestions)
+    suggestions.bind('<Return>', pick_suggestion)
+    suggestions.bind('<Double-Button-1>', pick_suggestion)
     id_entry_quick.focus()
 
 def view_attendance():
     """Display attendance records in a new window"""
-    conn = sqlite3.connect("database/attendance.db")
+    conn = attendance_db.connect()
     
     # Get attendance data
-    df = pd.read_sql_query("SELECT * FROM attendance ORDER BY date DESC, time DESC", conn)
+    df = report_cache.cache.attendance(conn, *report_range())
     conn.close()
+    show_report_cache_stats()
     
     if df.empty:
         messagebox.showinfo("Info", "No attendance records found!")
@@ -228,10 +225,9 @@ def view_attendance():
     view_window.geometry("800x600")
     
     # Create treeview
-    tree = ttk.Treeview(view_window, columns=('ID', 'Student_ID', 'Name', 'Date', 'Time', 'Status'), show='headings')
+    tree = ttk.Treeview(view_window, columns=('Student_ID', 'Name', 'Date', 'Time', 'Status'), show='headings')
     
     # Define headings
-    tree.heading('ID', text='ID')
     tree.heading('Student_ID', text='Student ID')
     tree.heading('Name', text='Name')
     tree.heading('Date', text='Date')
@@ -239,16 +235,15 @@ def view_attendance():
     tree.heading('Status', text='Status')
     
     # Configure column widths
-    tree.column('ID', width=50)
     tree.column('Student_ID', width=100)
-    tree.column('Name', width=200)
+    tree.column('Name', width=250)
     tree.column('Date', width=100)
     tree.column('Time', width=100)
     tree.column('Status', width=80)
     
     # Insert data
     for index, row in df.iterrows():
-        tree.insert('', 'end', values=(row['id'], row['student_id'], row['name'], row['date'], row['time'], row['status']))
+        tree.insert('', 'end', values=(row['student_id'], row['name'], row['date'], row['time'], row['status']))
     
     # Add scrollbar
     scrollbar = ttk.Scrollbar(view_window, orient='vertical', command=tree.yview)
@@ -260,10 +255,10 @@ def view_attendance():
 
 def view_students():
     """Display registered students"""
-    conn = sqlite3.connect("database/attendance.db")
+    conn = attendance_db.connect()
     
     # Get student data
-    df = pd.read_sql_query("SELECT * FROM students ORDER BY name", conn)
+    df = report_cache.cache.students(conn)
     conn.close()
     
     if df.empty:
@@ -304,35 +299,34 @@ def view_students():
 
 def export_to_excel():
     """Export attendance data to Excel file"""
-    conn = sqlite3.connect("database/attendance.db")
-    attendance_df = pd.read_sql_query("SELECT * FROM attendance ORDER BY date DESC, time DESC", conn)
-    students_df = pd.read_sql_query("SELECT * FROM students ORDER BY name", conn)
-    conn.close()
+    conn = attendance_db.connect()
+    attendance_df = report_cache.cache.attendance(conn, *report_range())
+    students_df = report_cache.cache.students(conn)
     
     if attendance_df.empty and students_df.empty:
+        conn.close()
         messagebox.showinfo("Info", "No data to export!")
         return
     
     try:
-        filename = f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            if not attendance_df.empty:
-                attendance_df.to_excel(writer, sheet_name='Attendance Records', index=False)
-            if not students_df.empty:
-                students_df.to_excel(writer, sheet_name='Registered Students', index=False)
+        filename = reports.export_filename()
+        report_cache.cache.export(conn, filename, *report_range())
         
         messagebox.showinfo("Success", f"Data exported to {filename}")
     except Exception as e:
         messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+    finally:
+        conn.close()
+        show_report_cache_stats()
 
 def generate_statistics():
     """Generate and display attendance statistics"""
-    conn = sqlite3.connect("database/attendance.db")
-    df = pd.read_sql_query("SELECT * FROM attendance", conn)
+    conn = attendance_db.connect()
+    report = report_cache.cache.statistics(conn, *report_range())
     conn.close()
+    show_report_cache_stats()
     
-    if df.empty:
+    if report is None:
         messagebox.showinfo("Info", "No attendance data available!")
         return
     
@@ -341,47 +335,28 @@ def generate_statistics():
     stats_window.title("Attendance Statistics")
     stats_window.geometry("600x400")
     
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'])
-    
     # Create statistics text
     stats_text = scrolledtext.ScrolledText(stats_window, wrap=tk.WORD, width=70, height=20)
     stats_text.pack(fill='both', expand=True, padx=10, pady=10)
     
-    # Calculate statistics
-    total_records = len(df)
-    unique_students = df['student_id'].nunique()
-    date_range = f"{df['date'].min().date()} to {df['date'].max().date()}"
-    
-    # Daily attendance count
-    daily_stats = df.groupby('date').size().describe()
-    
-    # Student attendance frequency
-    student_stats = df.groupby(['student_id', 'name']).size().sort_values(ascending=False)
-    
-    # Generate report text
-    report = f"""
-ATTENDANCE STATISTICS REPORT
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    stats_text.insert(tk.END, report)
+    stats_text.config(state=tk.DISABLED)
 
-OVERVIEW:
-Total attendance records: {total_records}
-Unique students: {unique_students}
-Date range: {date_range}
+def live_dashboard():
+    """Open the live dashboard, updated as students are marked"""
+    dashboard.open_dashboard(root, len(roster))
 
-DAILY ATTENDANCE STATISTICS:
-Average daily attendance: {daily_stats['mean']:.2f}
-Maximum daily attendance: {daily_stats['max']:.0f}
-Minimum daily attendance: {daily_stats['min']:.0f}
+def show_report_cache_stats():
+    """Report cache hit/miss counts in the status bar"""
+    stats = report_cache.cache.stats()
+    status_label.config(text=f"Ready | Report cache: {stats['hits']} hits, {stats['misses']} misses, "
+                             f"{stats['bytes'] / 1024 / 1024:.1f} MB")
 
-STUDENT ATTENDANCE FREQUENCY:
-"""
-    
-    for (student_id, name), count in student_stats.head(10).items():
-        report += f"{name} ({student_id}): {count} days\n"
-    
-    stats_text.insert(tk.END, report)
-    stats_text.config(state=tk.DISABLED)
+def report_range():
+    """Date range for the reports: the current term unless previous terms are included"""
+    if history_var.get():
+        return None, None
+    return attendance_db.current_term_range()
 
 def refresh_student_list():
     """Refresh any displayed student lists"""
@@ -469,6 +444,11 @@ view_students_btn = tk.Button(reports_frame, text="👥 View Students", command=
                              padx=15, pady=8, cursor='hand2')
 view_students_btn.pack(fill='x', pady=5)
 
+history_var = tk.BooleanVar(value=False)
+history_check = tk.Checkbutton(reports_frame, text="Include previous terms (archived)", variable=history_var,
+                               font=("Arial", 10), bg='#f0f0f0')
+history_check.pack(anchor='w')
+
 view_btn = tk.Button(reports_frame, text="👀 View Attendance Records", command=view_attendance,
                     font=("Arial", 11, "bold"), bg='#8e44ad', fg='white', 
                     padx=15, pady=8, cursor='hand2')
@@ -479,6 +459,11 @@ stats_btn = tk.Button(reports_frame, text="📈 Generate Statistics", command=ge
                      padx=15, pady=8, cursor='hand2')
 stats_btn.pack(fill='x', pady=5)
 
+dashboard_btn = tk.Button(reports_frame, text="📡 Live Dashboard", command=live_dashboard,
+                         font=("Arial", 11, "bold"), bg='#16a085', fg='white', 
+                         padx=15, pady=8, cursor='hand2')
+dashboard_btn.pack(fill='x', pady=5)
+
 export_btn = tk.Button(reports_frame, text="📤 Export to Excel", command=export_to_excel,
                       font=("Arial", 11, "bold"), bg='#34495e', fg='white', 
                       padx=15, pady=8, cursor='hand2')
@@ -511,5 +496,28 @@ instructions_label = tk.Label(instructions_frame, text=instructions_text,
                              justify='left', wraplength=500)
 instructions_label.pack(anchor='w')
 
+def check_writer():
+    """Show failed attendance writes in the status bar while they are retried"""
+    if writer.error:
+        status_label.config(text=f"⚠️ {writer.pending()} attendance rows not saved yet, retrying: {writer.error}",
+                            fg='#c0392b')
+    elif status_label.cget('fg') == '#c0392b':
+        status_label.config(text="Ready | All attendance saved", fg='#7f8c8d')
+    root.after(1000, check_writer)
+
+def on_close():
+    """Write any queued attendance before exiting"""
+    status_label.config(text="Saving attendance...")
+    root.update_idletasks()
+    unwritten = writer.close()
+    if unwritten:
+        messagebox.showerror("Error", f"{len(unwritten)} attendance rows could not be saved: {writer.error}\n"
+                                      "Mark these students again after the database is available.")
+    root.destroy()
+
+root.after(1000, check_writer)
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 if __name__ == "__main__":
     root.mainloop()
\ No newline at end of file
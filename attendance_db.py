@@ -0,0 +1,523 @@
+"""SQLite storage shared by app.py, app_simple.py and the benchmarks.
+
+Attendance rows are normalized to integers: `student` references
+students.id, `day` is the number of days since 1970-01-01, `time` is
+seconds since midnight and `status` is 1 for Present. Each table is
+WITHOUT ROWID with the primary key (day, student), so rows are clustered
+by day and a student can only be marked once per day.
+
+Attendance is partitioned by month: each month lives in its own table
+(attendance_YYYY_MM) so marking and current-term reports only touch the
+partitions they need. Months before the current term are compacted into
+gzip-compressed, read-only SQLite files in an archive folder next to the
+database (settings.ARCHIVE_DIR overrides it) and are only opened when a
+query asks for their date range. A read-only `attendance` view with the
+readable columns (student_id, name, date, time, status) is kept for
+ad-hoc queries.
+
+Triggers on students and on every partition bump a per-table counter in
+`data_versions` on each write, so report caches (report_cache.py) can tell
+which partitions changed, including writes from other processes.
+"""
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from urllib.request import pathname2url
+
+import pandas as pd
+
+import settings
+
+ATTENDANCE_COLUMNS = ["student_id", "name", "date", "time", "status"]
+PARTITION_PATTERN = re.compile(r"^attendance_(\d{4})_(\d{2})$")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+PRESENT = 1
+STATUS_NAMES = {0: "Absent", PRESENT: "Present"}
+
+# Readable columns for a partition aliased as `a`
+READABLE_COLUMNS = ("s.student_id AS student_id, s.name AS name, "
+                    "date(a.day * 86400, 'unixepoch') AS date, time(a.time, 'unixepoch') AS time, "
+                    "CASE a.status WHEN 1 THEN 'Present' ELSE 'Absent' END AS status")
+
+
+def connect(path=None):
+    """Open a connection to the attendance database"""
+    return sqlite3.connect(path or settings.DB_PATH)
+
+
+def init_db(path=None):
+    """Create the database folder and tables if they do not exist"""
+    path = path or settings.DB_PATH
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    conn = connect(path)
+    c = conn.cursor()
+    c.execute("""CREATE TABLE IF NOT EXISTS students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student_id TEXT UNIQUE,
+                    name TEXT,
+                    registered_date TEXT)""")
+    c.execute("""CREATE TABLE IF NOT EXISTS data_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL) WITHOUT ROWID""")
+    _ensure_version_triggers(conn, "students")
+
+    row = c.execute("SELECT type FROM sqlite_master WHERE name='attendance'").fetchone()
+    if row and row[0] == "table":
+        _migrate_text_table(conn, "attendance")
+    for table in live_partitions(conn):
+        if "student_id" in _columns(conn, table):
+            _migrate_text_table(conn, table)
+        else:
+            _ensure_version_triggers(conn, table)
+    ensure_partition(conn, today())
+    conn.commit()
+    conn.close()
+
+
+def today():
+    """Today's date as stored in the attendance table"""
+    return str(datetime.now().date())
+
+
+def now_time():
+    """Current time as stored in the attendance table"""
+    return str(datetime.now().time())[:8]
+
+
+# ---------- Conversions ----------
+def day_number(day=None):
+    """Days since 1970-01-01 for a "YYYY-MM-DD" string or date (default today)"""
+    if day is None:
+        day = date.today()
+    elif isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def day_string(number):
+    """"YYYY-MM-DD" for a day number"""
+    return str(date.fromordinal(number + EPOCH_ORDINAL))
+
+
+def time_seconds(value=None):
+    """Seconds since midnight for a "HH:MM:SS" string (default now)"""
+    if value is None:
+        now = datetime.now()
+        return now.hour * 3600 + now.minute * 60 + now.second
+    hours, minutes, seconds = (int(part) for part in value.split(":")[:3])
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# ---------- Partitions ----------
+def partition_name(day):
+    """Partition table holding the given day (day number, "YYYY-MM-DD" or date)"""
+    if isinstance(day, int):
+        day = day_string(day)
+    return f"attendance_{str(day)[:4]}_{str(day)[5:7]}"
+
+
+def live_partitions(conn):
+    """Names of the partition tables in the live database, oldest first"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'attendance_%'")
+    return sorted(name for (name,) in rows if PARTITION_PATTERN.match(name))
+
+
+def ensure_partition(conn, day):
+    """Create the partition for the given day if needed and return its name"""
+    table = partition_name(day)
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                    day INTEGER NOT NULL,
+                    student INTEGER NOT NULL REFERENCES students(id),
+                    time INTEGER NOT NULL,
+                    status INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (day, student)) WITHOUT ROWID""")
+    _ensure_version_triggers(conn, table)
+    _refresh_view(conn)
+    return table
+
+
+def _ensure_version_triggers(conn, table):
+    """Bump data_versions[table] on every insert, update and delete"""
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table}
+                         BEGIN
+                             INSERT INTO data_versions (name, version) VALUES ('{table}', 1)
+                             ON CONFLICT (name) DO UPDATE SET version = version + 1;
+                         END""")
+
+
+def data_versions(conn):
+    """{table: write counter} for students and the live partitions"""
+    return dict(conn.execute("SELECT name, version FROM data_versions"))
+
+
+def _refresh_view(conn):
+    """Rebuild the read-only `attendance` view over all live partitions"""
+    partitions = [t for t in live_partitions(conn) if "student_id" not in _columns(conn, t)]
+    conn.execute("DROP VIEW IF EXISTS attendance")
+    if partitions:
+        union = " UNION ALL ".join(f"SELECT * FROM {t}" for t in partitions)
+        conn.execute(f"CREATE VIEW attendance AS SELECT {READABLE_COLUMNS} "
+                     f"FROM ({union}) a JOIN students s ON s.id = a.student")
+
+
+def _legacy_name(conn, source):
+    """Unused name to keep an old text table under"""
+    legacy, number = f"{source}_legacy", 1
+    while conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (legacy,)).fetchone():
+        number += 1
+        legacy = f"{source}_legacy{number}"
+    return legacy
+
+
+def _migrate_text_table(conn, source):
+    """Copy rows from an old text attendance table into the normalized monthly partitions
+
+    The old table is kept, renamed to <source>_legacy, so nothing is lost:
+    rows whose date or time cannot be parsed are not migrated and only
+    reported. Drop the legacy table once its rows have been checked.
+    """
+    # Register every student seen in the old rows; app.py stored "<id>_<name>" as the name
+    conn.execute(f"""INSERT OR IGNORE INTO students (student_id, name, registered_date)
+                     SELECT student_id,
+                            CASE WHEN substr(name, 1, length(student_id) + 1) = student_id || '_'
+                                 THEN substr(name, length(student_id) + 2) ELSE name END,
+                            min(date)
+                     FROM {source} GROUP BY student_id""")
+
+    months = [m for (m,) in conn.execute(f"SELECT DISTINCT substr(date, 1, 7) FROM {source} "
+                                         f"WHERE julianday(date) IS NOT NULL")]
+    legacy = _legacy_name(conn, source)
+    conn.execute(f"ALTER TABLE {source} RENAME TO {legacy}")
+    for month in months:
+        table = ensure_partition(conn, f"{month}-01")
+        # INSERT OR IGNORE keeps the first mark of a student on a day
+        conn.execute(f"""INSERT OR IGNORE INTO {table} (day, student, time, status)
+                         SELECT CAST(julianday(l.date) - 2440587.5 AS INTEGER), s.id,
+                                CAST(strftime('%s', '1970-01-01 ' || l.time) AS INTEGER),
+                                CASE l.status WHEN 'Present' THEN 1 ELSE 0 END
+                         FROM {legacy} l JOIN students s ON s.student_id = l.student_id
+                         WHERE substr(l.date, 1, 7) = ? AND strftime('%s', '1970-01-01 ' || l.time) IS NOT NULL
+                         ORDER BY l.date, l.time""", (month,))
+    skipped = conn.execute(f"SELECT count(*) FROM {legacy} WHERE julianday(date) IS NULL "
+                           f"OR strftime('%s', '1970-01-01 ' || time) IS NULL").fetchone()[0]
+    if skipped:
+        print(f"{skipped} rows of {source} have an unreadable date or time and were not migrated, "
+              f"they are kept in {legacy}")
+    _refresh_view(conn)
+    conn.commit()
+
+
+def _month_key(table):
+    match = PARTITION_PATTERN.match(table)
+    return f"{match.group(1)}-{match.group(2)}"
+
+
+def current_term_range(day=None):
+    """(start, end) dates of the term containing the given day, see settings.TERM_STARTS"""
+    day = date.fromisoformat(day) if isinstance(day, str) else (day or date.today())
+    starts = sorted((int(m), int(d)) for m, d in (s.split("-") for s in settings.TERM_STARTS))
+    candidates = [date(year, m, d) for year in (day.year - 1, day.year, day.year + 1) for m, d in starts]
+    start = max(c for c in candidates if c <= day)
+    end = min(c for c in candidates if c > day) - timedelta(days=1)
+    return str(start), str(end)
+
+
+# ---------- Archive ----------
+def archive_dir(conn):
+    """Folder holding the archived partitions of this database"""
+    if settings.ARCHIVE_DIR:
+        return settings.ARCHIVE_DIR
+    db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    return os.path.join(os.path.dirname(db_file) or ".", "archive")
+
+
+def archive_path(directory, table):
+    """Compressed archive file of a partition"""
+    return os.path.join(directory, f"{table}.db.gz")
+
+
+def archive_version(conn, table):
+    """Modification stamp of an archived partition, changes when late rows are merged into it"""
+    return os.stat(archive_path(archive_dir(conn), table)).st_mtime_ns
+
+
+def archived_partitions(conn):
+    """Names of the partitions that have been moved to the archive, oldest first"""
+    directory = archive_dir(conn)
+    if not os.path.isdir(directory):
+        return []
+    names = (f[:-len(".db.gz")] for f in os.listdir(directory) if f.endswith(".db.gz"))
+    return sorted(name for name in names if PARTITION_PATTERN.match(name))
+
+
+def _write_archive(directory, table, rows):
+    """Write readable rows into the partition's archive, merging them into an existing one"""
+    target = archive_path(directory, table)
+    # Unique names, so processes never share a staging file
+    fd, staging = tempfile.mkstemp(prefix=f"{table}.", suffix=".db", dir=directory)
+    os.close(fd)
+    try:
+        merging = os.path.exists(target)
+        if merging:
+            with gzip.open(target, "rb") as src, open(staging, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        archive = sqlite3.connect(staging)
+        if merging:
+            # Keep the archived rows, add the ones that are not archived yet
+            archive.executemany("INSERT INTO attendance SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS "
+                                "(SELECT 1 FROM attendance WHERE date = ? AND student_id = ?)",
+                                [row + (row[2], row[0]) for row in rows])
+        else:
+            # Archives hold readable rows so they stay valid on their own
+            archive.execute("CREATE TABLE attendance (student_id TEXT, name TEXT, date TEXT, time TEXT, status TEXT)")
+            archive.executemany("INSERT INTO attendance VALUES (?, ?, ?, ?, ?)", rows)
+            archive.execute("CREATE INDEX attendance_date ON attendance (date)")
+        archive.commit()
+        archive.close()
+
+        # Replace the archive only once the new one is complete
+        compressed = f"{staging}.gz"
+        with open(staging, "rb") as src, gzip.open(compressed, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(compressed, target)
+    finally:
+        for leftover in (staging, f"{staging}.gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def archive_old_partitions(path=None, before=None):
+    """Compact every live partition older than `before` (default: current term start) into the archive
+
+    A month that is already archived (rows marked late, e.g. a backfill or a
+    kiosk clock running behind) is merged into its existing archive. Each
+    partition is archived under the database write lock (BEGIN IMMEDIATE),
+    so processes sharing the database never archive the same month twice.
+    When another process holds the database past the busy timeout, the
+    remaining months are left for the next start.
+    """
+    before = (before or current_term_range()[0])[:7]
+    conn = connect(path)
+    directory = archive_dir(conn)
+    archived = []
+    for table in live_partitions(conn):
+        if _month_key(table) >= before:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            print(f"Skipping the archive of {table}, the database is busy: {e}")
+            break
+        try:
+            # Another process may have archived it while we waited for the lock
+            if table not in live_partitions(conn):
+                conn.rollback()
+                continue
+            rows = conn.execute(f"SELECT {READABLE_COLUMNS} FROM {table} a JOIN students s ON s.id = a.student "
+                                f"ORDER BY a.day, a.time").fetchall()
+            os.makedirs(directory, exist_ok=True)
+            _write_archive(directory, table, rows)
+            conn.execute(f"DROP TABLE {table}")
+            conn.execute("DELETE FROM data_versions WHERE name=?", (table,))
+            _refresh_view(conn)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            # The rows stay live; merging is idempotent, so the next start finishes the job
+            conn.rollback()
+            print(f"Skipping the archive of {table}, the database is busy: {e}")
+            break
+        except BaseException:
+            conn.rollback()
+            raise
+        archived.append(table)
+
+    if archived:
+        try:
+            conn.execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            # Only reclaims space, another process having the database open is fine
+            print(f"Skipping VACUUM after archiving: {e}")
+    conn.close()
+    return archived
+
+
+def _open_archive(directory, table):
+    """Read-only connection to an archived partition, decompressing it on first use"""
+    cache_dir = os.path.join(directory, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, f"{table}.db")
+    source = archive_path(directory, table)
+    if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(source):
+        temporary = f"{cached}.{os.getpid()}.tmp"
+        with gzip.open(source, "rb") as src, open(temporary, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temporary, cached)
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(cached))}?mode=ro", uri=True)
+
+
+# ---------- Students ----------
+def add_student(conn, student_id, name):
+    """Register a student and return its key, raises sqlite3.IntegrityError if the ID already exists"""
+    c = conn.execute("INSERT INTO students (student_id, name, registered_date) VALUES (?, ?, ?)",
+                     (student_id, name, today()))
+    conn.commit()
+    return c.lastrowid
+
+
+def ensure_students(conn, students):
+    """Integer keys for (student_id, name) pairs, registering the ones that are missing"""
+    conn.executemany("INSERT OR IGNORE INTO students (student_id, name, registered_date) VALUES (?, ?, ?)",
+                     [(student_id, name, today()) for student_id, name in students])
+    conn.commit()
+    keys = dict(conn.execute("SELECT student_id, id FROM students"))
+    return [keys[student_id] for student_id, _ in students]
+
+
+def find_student(conn, student_id):
+    """Return (key, name) for a registered student ID, or None"""
+    return conn.execute("SELECT id, name FROM students WHERE student_id=?", (student_id,)).fetchone()
+
+
+# ---------- Marking ----------
+def is_marked(conn, student, day=None):
+    """Check whether a student (integer key) already has attendance for the given day"""
+    day = day_number(day) if not isinstance(day, int) else day
+    try:
+        c = conn.execute(f"SELECT 1 FROM {partition_name(day)} WHERE day=? AND student=?", (day, student))
+    except sqlite3.OperationalError:
+        return False  # Partition not created yet, so nobody is marked
+    return c.fetchone() is not None
+
+
+def mark_present(conn, student, day=None, time=None, commit=True):
+    """Insert a Present row for the student (integer key), ignored if already marked that day"""
+    day = day_number(day) if not isinstance(day, int) else day
+    time = time_seconds(time) if not isinstance(time, int) else time
+    mark_present_many(conn, [(student, day, time)], commit)
+
+
+def mark_present_many(conn, rows, commit=True):
+    """Insert many (student, day number, seconds) Present rows in one transaction"""
+    by_partition = {}
+    for student, day, time in rows:
+        by_partition.setdefault(partition_name(day), []).append((day, student, time))
+    for table, partition_rows in by_partition.items():
+        sql = f"INSERT OR IGNORE INTO {table} (day, student, time, status) VALUES (?, ?, ?, {PRESENT})"
+        try:
+            conn.executemany(sql, partition_rows)
+        except sqlite3.OperationalError:
+            ensure_partition(conn, partition_rows[0][0])
+            conn.executemany(sql, partition_rows)
+    if commit:
+        conn.commit()
+
+
+def present_students(conn, day=None):
+    """Set of student keys already marked on the given day"""
+    day = day_number(day) if not isinstance(day, int) else day
+    try:
+        c = conn.execute(f"SELECT student FROM {partition_name(day)} WHERE day=?", (day,))
+    except sqlite3.OperationalError:
+        return set()
+    return {row[0] for row in c.fetchall()}
+
+
+def arrival_times(conn, day=None):
+    """Seconds since midnight of every Present row on the given day"""
+    day = day_number(day) if not isinstance(day, int) else day
+    try:
+        c = conn.execute(f"SELECT time FROM {partition_name(day)} WHERE day=?", (day,))
+    except sqlite3.OperationalError:
+        return []
+    return [row[0] for row in c.fetchall()]
+
+
+# ---------- Reports ----------
+def _in_range(table, start, end):
+    month = _month_key(table)
+    return (start is None or month >= start[:7]) and (end is None or month <= end[:7])
+
+
+def attendance_sources(conn, start=None, end=None):
+    """(table, archived) for every partition overlapping the range, newest first
+
+    A month can be both archived and live when rows were marked after it was
+    archived; both sources are returned then.
+    """
+    live = [t for t in live_partitions(conn) if _in_range(t, start, end)]
+    archived = [t for t in archived_partitions(conn) if _in_range(t, start, end)]
+    return sorted([(t, False) for t in live] + [(t, True) for t in archived], reverse=True)
+
+
+def fetch_partition(conn, table, archived=False, start=None, end=None):
+    """Readable attendance rows of one partition between start and end, newest first
+
+    Live partitions are read through the clustered (day, student) key;
+    archived months are opened on demand.
+    """
+    if archived:
+        conditions = [c for c, value in (("date >= ?", start), ("date <= ?", end)) if value]
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        archive = _open_archive(archive_dir(conn), table)
+        df = pd.read_sql_query(f"SELECT {', '.join(ATTENDANCE_COLUMNS)} FROM attendance{where} "
+                               f"ORDER BY date DESC, time DESC", archive, params=[v for v in (start, end) if v])
+        archive.close()
+        return df
+
+    conditions = [c for c, value in (("a.day >= ?", start), ("a.day <= ?", end)) if value]
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return pd.read_sql_query(f"SELECT {READABLE_COLUMNS} FROM {table} a JOIN students s ON s.id = a.student{where} "
+                             f"ORDER BY a.day DESC, a.time DESC", conn,
+                             params=[day_number(v) for v in (start, end) if v])
+
+
+def combine_attendance(frames, overlapping=False):
+    """Concatenate per-partition frames given newest partition first
+
+    `overlapping` is set when a month has both live and archived rows, which
+    then have to be de-duplicated and merged back into newest-first order.
+    """
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+    if len(frames) == 1:
+        return frames[0]
+    df = pd.concat(frames, ignore_index=True)
+    if overlapping:
+        # Archived rows come first and win over a late duplicate, as archive_old_partitions() merges them
+        df = df.drop_duplicates(["date", "student_id"], keep="first")
+        return df.sort_values(["date", "time"], ascending=False, kind="stable", ignore_index=True)
+    # Partitions are disjoint months, so the result is already newest first
+    return df
+
+
+def has_overlapping_sources(sources):
+    """Whether attendance_sources() returned a month both live and archived"""
+    return len({table for table, _ in sources}) < len(sources)
+
+
+def fetch_attendance(conn, start=None, end=None):
+    """Attendance records between start and end (inclusive, None = open), newest first
+
+    Only the partitions overlapping the range are read.
+    """
+    sources = attendance_sources(conn, start, end)
+    return combine_attendance([fetch_partition(conn, table, archived, start, end) for table, archived in sources],
+                              has_overlapping_sources(sources))
+
+
+def fetch_students(conn):
+    """All registered students ordered by name"""
+    return pd.read_sql_query("SELECT * FROM students ORDER BY name", conn)
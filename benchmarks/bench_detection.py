@@ -0,0 +1,145 @@
+"""Compare face detection backends on a fixed local image set.
+
+The image directory must contain the images plus a labels.json file that
+maps each image name to its ground truth face boxes in
+(top, right, bottom, left) pixel format:
+
+    {"frame_001.jpg": [[40, 210, 190, 60]], "frame_002.jpg": []}
+
+Usage:
+    python benchmarks/bench_detection.py --images data/bench_faces
+    python benchmarks/bench_detection.py --images data/bench_faces --backends hog,haar,ssd --batch 4 --scale 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detectors import BACKENDS, create_detector  # noqa: E402
+
+
+def load_image_set(images_dir, scale):
+    """Load the images and their labels, resized by scale"""
+    labels_path = os.path.join(images_dir, "labels.json")
+    if not os.path.exists(labels_path):
+        raise SystemExit(f"Missing {labels_path}; see the module docstring for the expected format")
+    with open(labels_path) as f:
+        labels = json.load(f)
+
+    images = []
+    for image_name, boxes in sorted(labels.items()):
+        image = cv2.imread(os.path.join(images_dir, image_name))
+        if image is None:
+            print(f"Skipping unreadable image {image_name}")
+            continue
+        if scale != 1.0:
+            image = cv2.resize(image, (0, 0), fx=scale, fy=scale)
+        images.append((image_name, image, [[v * scale for v in box] for box in boxes]))
+    return images
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(predicted, truth, threshold):
+    """Greedily match predictions to ground truth, returning the true positive count"""
+    unmatched = list(truth)
+    true_positives = 0
+    for box in predicted:
+        scores = [iou(box, t) for t in unmatched]
+        if scores and max(scores) >= threshold:
+            unmatched.pop(int(np.argmax(scores)))
+            true_positives += 1
+    return true_positives
+
+
+def bench_backend(backend, images, batch_size, repeat, iou_threshold):
+    """Time one backend and compute its recall and precision"""
+    detector = create_detector(backend)
+    inputs = [detector.prepare(image) for _, image, _ in images]
+
+    # Warm up (model loading, first allocation)
+    detector.detect(inputs[0])
+
+    single_times = []
+    predictions = []
+    for _ in range(repeat):
+        predictions = []
+        for image in inputs:
+            start = time.perf_counter()
+            predictions.append(detector.detect(image))
+            single_times.append((time.perf_counter() - start) * 1000)
+
+    batch_times = []
+    for _ in range(repeat):
+        for i in range(0, len(inputs), batch_size):
+            chunk = inputs[i:i + batch_size]
+            start = time.perf_counter()
+            detector.detect_batch(chunk)
+            batch_times.append((time.perf_counter() - start) * 1000 / len(chunk))
+
+    total_truth = sum(len(truth) for _, _, truth in images)
+    total_predicted = sum(len(p) for p in predictions)
+    true_positives = sum(match_boxes(p, truth, iou_threshold) for p, (_, _, truth) in zip(predictions, images))
+
+    return {
+        "backend": backend,
+        "images": len(images),
+        "latency_ms_mean": float(np.mean(single_times)),
+        "latency_ms_p50": float(np.percentile(single_times, 50)),
+        "latency_ms_p95": float(np.percentile(single_times, 95)),
+        "batch_size": batch_size,
+        "batch_latency_ms_per_image": float(np.mean(batch_times)),
+        "recall": true_positives / total_truth if total_truth else None,
+        "precision": true_positives / total_predicted if total_predicted else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detection backends")
+    parser.add_argument("--images", required=True, help="Directory with images and labels.json")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma separated backends to compare")
+    parser.add_argument("--batch", type=int, default=4, help="Batch size for detect_batch")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the image set")
+    parser.add_argument("--scale", type=float, default=0.25, help="Resize factor applied before detection")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU threshold for a correct detection")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    images = load_image_set(args.images, args.scale)
+    if not images:
+        raise SystemExit("No images to benchmark")
+
+    results = []
+    for backend in args.backends.split(","):
+        try:
+            result = bench_backend(backend.strip(), images, args.batch, args.repeat, args.iou)
+        except (ImportError, FileNotFoundError, ValueError) as e:
+            print(f"{backend:6s} skipped: {e}")
+            continue
+        results.append(result)
+        recall = "n/a" if result["recall"] is None else f"{result['recall']:.3f}"
+        print(f"{backend:6s} mean {result['latency_ms_mean']:8.2f} ms  p95 {result['latency_ms_p95']:8.2f} ms  "
+              f"batched {result['batch_latency_ms_per_image']:8.2f} ms/img  recall {recall}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
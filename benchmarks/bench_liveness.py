@@ -0,0 +1,127 @@
+"""Cost and calibration of the liveness (anti-spoof) check.
+
+Times each tier of liveness.LivenessChecker per recognized face: the
+texture scores of the face crop, the landmark tier (when face_recognition
+is installed) and a whole check(). It also prints the texture scores and
+the verdict at the current thresholds for each class of face crop:
+
+    synthetic (default) - a textured face, a blurred copy (print) and a copy
+                          with a fine moire grid (screen)
+    --frames-dir DIR    - recorded face crops in DIR/live and DIR/spoof, to
+                          calibrate ATTENDANCE_LIVENESS_* for real cameras
+
+Usage:
+    python benchmarks/bench_liveness.py
+    python benchmarks/bench_liveness.py --frames-dir recordings/liveness --repeat 500
+    python benchmarks/bench_liveness.py --mode texture
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import liveness  # noqa: E402
+import settings  # noqa: E402
+
+
+def synthetic_crops(size=200, seed=0):
+    """{"live": [...], "print": [...], "screen": [...]} BGR face crops"""
+    rng = np.random.default_rng(seed)
+    crops = {"live": [], "print": [], "screen": []}
+    y, x = np.mgrid[:size, :size]
+    for _ in range(10):
+        face = np.full((size, size, 3), 90, dtype=np.float32)
+        cv2.ellipse(face, (size // 2, size // 2), (size // 3, size * 2 // 5), 0, 0, 360, (140, 170, 210), -1)
+        for eye_x in (size // 3, size * 2 // 3):
+            cv2.circle(face, (eye_x, size * 2 // 5), size // 20, (40, 40, 40), -1)
+        cv2.line(face, (size * 2 // 5, size * 7 // 10), (size * 3 // 5, size * 7 // 10), (60, 60, 120), 3)
+        face = cv2.GaussianBlur(face, (0, 0), 1.0)
+        live = face + rng.normal(0, 6, size=face.shape)  # Skin and sensor texture
+        crops["live"].append(live.clip(0, 255).astype(np.uint8))
+        crops["print"].append(cv2.GaussianBlur(live, (0, 0), 3.0).clip(0, 255).astype(np.uint8))
+        # Screen pixel grid beating with the camera sensor, ~8 px period in the crop
+        grid = 25 * np.sin(x * 0.8 + rng.uniform(0, np.pi)) * np.sin(y * 0.8)
+        crops["screen"].append((live + grid[..., None]).clip(0, 255).astype(np.uint8))
+    return crops
+
+
+def recorded_crops(directory):
+    crops = {}
+    for label in ("live", "spoof"):
+        folder = os.path.join(directory, label)
+        names = sorted(f for f in os.listdir(folder) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+        crops[label] = [cv2.imread(os.path.join(folder, name)) for name in names]
+    return crops
+
+
+def mean_ms(fn, items, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(items[i % len(items)])
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def texture_scores_of(checker, image, box):
+    """Texture scores on the same resized crop the checker uses"""
+    checker._texture_passes(image, box)
+    return liveness.texture_scores(checker._crop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the liveness check")
+    parser.add_argument("--frames-dir", help="Folder with live/ and spoof/ face crops")
+    parser.add_argument("--mode", choices=liveness.MODES[1:], default="full",
+                        help="Mode to time, independent of ATTENDANCE_LIVENESS (default: full)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    crops = recorded_crops(args.frames_dir) if args.frames_dir else synthetic_crops()
+    checker = liveness.LivenessChecker(mode=args.mode, window=float("inf"))
+    results = {"mode": checker.mode, "budget_ms": settings.LIVENESS_BUDGET_MS, "classes": {}, "cost_ms": {}}
+
+    print(f"{'class':8s} {'laplacian':>10s} {'hf ratio':>9s} {'texture pass':>13s}")
+    for label, images in crops.items():
+        scores = []
+        for image in images:
+            height, width = image.shape[:2]
+            scores.append(texture_scores_of(checker, image, (0, width, height, 0)))
+        laplacian = np.array([s[0] for s in scores])
+        high_frequency = np.array([s[1] for s in scores])
+        passed = [checker._texture_passes(image, (0, image.shape[1], image.shape[0], 0)) for image in images]
+        results["classes"][label] = {"laplacian_median": float(np.median(laplacian)),
+                                     "hf_ratio_median": float(np.median(high_frequency)),
+                                     "texture_pass_rate": float(np.mean(passed))}
+        r = results["classes"][label]
+        print(f"{label:8s} {r['laplacian_median']:10.1f} {r['hf_ratio_median']:9.4f} {r['texture_pass_rate']:13.0%}")
+
+    live = crops["live"]
+    boxes = [(0, image.shape[1], image.shape[0], 0) for image in live]
+    items = list(zip(live, boxes))
+    cost = results["cost_ms"]
+    cost["texture"] = mean_ms(lambda item: checker._texture_passes(*item), items, args.repeat)
+    if checker.mode == "full":
+        small = [(cv2.cvtColor(cv2.resize(image, (0, 0), fx=0.5, fy=0.5), cv2.COLOR_BGR2RGB),
+                  tuple(v // 2 for v in box)) for image, box in items]
+        cost["landmarks"] = mean_ms(lambda item: checker._update_temporal(liveness.Track(0.0), *item),
+                                    small, args.repeat)
+
+    def check(item):
+        checker.tracks.clear()  # Every call is a new candidate that runs all tiers
+        checker.check("bench", *item)
+    cost["check"] = mean_ms(check, items, args.repeat)
+    print(", ".join(f"{tier} {ms:.3f} ms" for tier, ms in cost.items()) + f" per recognition ({checker.mode})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Per-frame latency and allocations of the frame preprocessing stage.
+
+Compares the original per-frame path (cap.read() into a new frame, then
+cv2.resize and cv2.cvtColor into new arrays) with preprocess.FramePreprocessor,
+which reads and converts into reused buffers. Frames come from a generated
+MJPG video, so capture decoding can be included without a camera; the
+preprocessing alone is also timed on in-memory frames. Allocations are
+measured with tracemalloc: the peak bytes allocated while handling one
+frame, averaged over the run.
+
+Usage:
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --resolutions 1920x1080 --colors gray --frames 300
+    python benchmarks/bench_preprocess.py --capture --faces
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess import FramePreprocessor  # noqa: E402
+
+
+def synthetic_frames(width, height, count=30, seed=0):
+    """Smooth frames with a moving face-sized blob, closer to camera output than noise"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    background = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))])
+    frames = []
+    for i in range(count):
+        frame = (background + rng.normal(0, 4, size=background.shape)).clip(0, 255).astype(np.uint8)
+        center = (width // 2 + i * width // (4 * count), height // 2)
+        cv2.ellipse(frame, center, (width // 8, height // 5), 0, 0, 360, (140, 170, 210), -1)
+        frames.append(frame)
+    return frames
+
+
+def write_video(path, frames):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+class Frames:
+    """Endless in-memory frames with the same read() interface as a capture"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.index = 0
+
+    def read(self, image=None):
+        self.index = (self.index + 1) % len(self.frames)
+        return True, self.frames[self.index]
+
+
+class Video:
+    """Endless frames from a video file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if not ret:
+            self.cap.release()
+            self.cap = cv2.VideoCapture(self.path)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+
+def legacy_step(source, color, scale):
+    """The loop before the fast path: every array is newly allocated"""
+    _, frame = source.read()
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    if color == "gray":
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return rgb
+
+
+def fast_step(source, preprocessor, faces):
+    _, frame = preprocessor.read(source)
+    detector_input = preprocessor.process(frame)
+    return preprocessor.rgb() if faces else detector_input
+
+
+def measure(step, frames):
+    """Mean per-frame latency (ms) and mean per-frame peak allocation (KB)"""
+    step()  # Warm up and allocate reused buffers
+    start = time.perf_counter()
+    for _ in range(frames):
+        step()
+    latency = (time.perf_counter() - start) * 1000 / frames
+
+    tracemalloc.start()
+    allocated = []
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        step()
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return latency, float(np.mean(allocated)) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame preprocessing")
+    parser.add_argument("--resolutions", default="1280x720,1920x1080", help="Comma separated WIDTHxHEIGHT")
+    parser.add_argument("--colors", default="rgb,gray,bgr", help="Detector colour layouts to test")
+    parser.add_argument("--scale", type=float, default=0.25)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--faces", action="store_true",
+                        help="Convert to RGB every frame, as when every frame has a face to encode")
+    parser.add_argument("--capture", action="store_true",
+                        help="Read the frames through a VideoCapture (includes MJPG decoding)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="attendance_preprocess_")
+    results = []
+    print(f"{'resolution':12s} {'color':6s} {'legacy ms':>10s} {'fast ms':>10s} {'legacy KB':>10s} {'fast KB':>10s}")
+    for resolution in args.resolutions.split(","):
+        width, height = (int(v) for v in resolution.split("x"))
+        frames = synthetic_frames(width, height)
+        if args.capture:
+            path = os.path.join(workdir, f"{resolution}.avi")
+            write_video(path, frames)
+        for color in args.colors.split(","):
+            source = Video(path) if args.capture else Frames(frames)
+            legacy = measure(lambda: legacy_step(source, color, args.scale), args.frames)
+            preprocessor = FramePreprocessor(color, args.scale, 1.0)
+            fast = measure(lambda: fast_step(source, preprocessor, args.faces), args.frames)
+            results.append({"resolution": resolution, "color": color,
+                            "legacy_ms": legacy[0], "fast_ms": fast[0],
+                            "legacy_kb_per_frame": legacy[1], "fast_kb_per_frame": fast[1]})
+            print(f"{resolution:12s} {color:6s} {legacy[0]:10.3f} {fast[0]:10.3f} {legacy[1]:10.1f} {fast[1]:10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scale": args.scale, "faces": args.faces, "capture": args.capture, "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
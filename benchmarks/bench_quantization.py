@@ -0,0 +1,100 @@
+"""Memory and accuracy of quantized encoding storage against float64.
+
+Builds the exact FaceMatcher and a QuantizedMatcher for each storage on the
+same synthetic students, then matches probes whose distance to their
+student is spread around the tolerance (the cases quantization can flip)
+plus strangers. Reports memory per 10k students, match latency, how many
+decisions differ from float64 and the distance error.
+
+Usage:
+    python benchmarks/bench_quantization.py
+    python benchmarks/bench_quantization.py --students 10000 --probes 5000 --top-k 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import recognition  # noqa: E402
+from fixtures import ENCODING_SIZE, random_encodings, student_key  # noqa: E402
+
+
+def boundary_probes(known, count, tolerance, seed=0, unknown_ratio=0.2):
+    """Noisy copies whose distance to the source student is spread over 0.5x-1.5x tolerance"""
+    rng = np.random.default_rng(seed + 1)
+    probes = []
+    for _ in range(count):
+        if rng.random() < unknown_ratio:
+            probes.append(rng.normal(0.0, 0.09, size=ENCODING_SIZE))
+            continue
+        noise = rng.normal(0.0, 1.0, size=ENCODING_SIZE)
+        target = rng.uniform(0.5, 1.5) * tolerance
+        probes.append(known[rng.integers(len(known))] + noise / np.linalg.norm(noise) * target)
+    return np.array(probes)
+
+
+def timed_batches(matcher, probes, batch=32):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(probes), batch):
+        results.extend(matcher.match_batch(probes[i:i + batch]))
+    return results, (time.perf_counter() - start) * 1000 / len(probes)
+
+
+def compare(exact, approximate, tolerance):
+    decisions = [a[0] != e[0] for e, a in zip(exact, approximate)]
+    errors = [abs(a[1] - e[1]) for e, a in zip(exact, approximate)]
+    near = [abs(e[1] - tolerance) < 0.01 for e in exact]
+    return {
+        "decisions_changed": int(sum(decisions)),
+        "decisions_changed_pct": 100.0 * sum(decisions) / len(exact),
+        "changed_outside_0.01_of_tolerance": int(sum(d and not n for d, n in zip(decisions, near))),
+        "distance_error_mean": float(np.mean(errors)),
+        "distance_error_max": float(np.max(errors)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized encoding storage")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--probes", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    known = random_encodings(args.students, args.seed)
+    encodings = {student_key(i): encoding for i, encoding in enumerate(known)}
+    probes = boundary_probes(known, args.probes, args.tolerance, args.seed)
+
+    exact_matcher = recognition.FaceMatcher(encodings, args.tolerance)
+    exact, exact_ms = timed_batches(exact_matcher, probes)
+    per_10k = 10000 / args.students
+    results = {"students": args.students, "probes": args.probes, "tolerance": args.tolerance, "top_k": args.top_k,
+               "float64": {"mb_per_10k_students": exact_matcher.nbytes * per_10k / 1e6, "match_ms": exact_ms}}
+
+    print(f"{'storage':8s} {'MB/10k':>8s} {'ms/match':>9s} {'changed':>8s} {'err mean':>9s} {'err max':>9s}")
+    print(f"{'float64':8s} {results['float64']['mb_per_10k_students']:8.2f} {exact_ms:9.4f}")
+    for storage in ("float16", "int8"):
+        matcher = recognition.QuantizedMatcher(encodings, args.tolerance, storage, args.top_k)
+        approximate, match_ms = timed_batches(matcher, probes)
+        results[storage] = {"mb_per_10k_students": matcher.nbytes * per_10k / 1e6, "match_ms": match_ms}
+        results[storage].update(compare(exact, approximate, args.tolerance))
+        r = results[storage]
+        print(f"{storage:8s} {r['mb_per_10k_students']:8.2f} {match_ms:9.4f} {r['decisions_changed']:8d} "
+              f"{r['distance_error_mean']:9.5f} {r['distance_error_max']:9.5f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
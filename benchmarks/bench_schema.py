@@ -0,0 +1,181 @@
+"""Compare the old text attendance table with the normalized partitioned schema.
+
+Builds the same synthetic attendance history twice - once in the original
+single `attendance` table (TEXT student_id/name/date/time) and once through
+attendance_db (integer keys, WITHOUT ROWID monthly partitions) - and
+reports the on-disk size and the latency of the report queries.
+
+Usage:
+    python benchmarks/bench_schema.py --rows 10000000 --students 5000
+    python benchmarks/bench_schema.py --rows 1000000 --output schema.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+
+CHUNK = 200000
+
+
+def synthetic_rows(rows, students, seed=0):
+    """Yield (student index, date, seconds) in day order, ~90% of students present per day"""
+    rng = np.random.default_rng(seed)
+    per_day = max(1, int(students * 0.9))
+    days = -(-rows // per_day)
+    start = date.today() - timedelta(days=days)
+    produced = 0
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        present = rng.permutation(students)[:min(per_day, rows - produced)]
+        seconds = 8 * 3600 + rng.integers(0, 4 * 3600, size=len(present))
+        for index, second in zip(present, seconds):
+            yield int(index), day, int(second)
+        produced += len(present)
+
+
+def student_id(index):
+    return f"S{index:06d}"
+
+
+def build_legacy(path, rows, students):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE attendance (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student_id TEXT,
+                    name TEXT,
+                    date TEXT,
+                    time TEXT,
+                    status TEXT)""")
+    batch = []
+    for index, day, second in synthetic_rows(rows, students):
+        # app.py stores the whole "<id>_<name>" folder string as the name
+        batch.append((student_id(index), f"{student_id(index)}_Student {index}", str(day),
+                      f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}", "Present"))
+        if len(batch) >= CHUNK:
+            conn.executemany("INSERT INTO attendance (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
+                             batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO attendance (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
+                         batch)
+    conn.commit()
+    conn.close()
+
+
+def build_normalized(path, rows, students):
+    attendance_db.init_db(path)
+    conn = attendance_db.connect(path)
+    keys = attendance_db.ensure_students(conn, [(student_id(i), f"Student {i}") for i in range(students)])
+    batch = []
+    for index, day, second in synthetic_rows(rows, students):
+        batch.append((keys[index], attendance_db.day_number(day), second))
+        if len(batch) >= CHUNK:
+            attendance_db.mark_present_many(conn, batch, commit=False)
+            batch = []
+    if batch:
+        attendance_db.mark_present_many(conn, batch, commit=False)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def legacy_queries(path, last_day, sid, repeat):
+    conn = sqlite3.connect(path)
+    month_start = last_day[:8] + "01"
+    results = {
+        # The queries app.py ran before the schema change
+        "duplicate_check_ms": timed(lambda: conn.execute(
+            "SELECT * FROM attendance WHERE student_id=? AND date=?", (sid, last_day)).fetchall(), repeat),
+        "month_view_ms": timed(lambda: conn.execute(
+            "SELECT * FROM attendance WHERE date >= ? ORDER BY date DESC, time DESC", (month_start,)).fetchall(),
+            repeat),
+        "daily_counts_ms": timed(lambda: conn.execute(
+            "SELECT date, count(*) FROM attendance GROUP BY date").fetchall(), repeat),
+        "student_counts_ms": timed(lambda: conn.execute(
+            "SELECT student_id, name, count(*) FROM attendance GROUP BY student_id, name").fetchall(), repeat),
+    }
+    conn.close()
+    return results
+
+
+def normalized_queries(path, last_day, sid, repeat):
+    conn = attendance_db.connect(path)
+    month_start = last_day[:8] + "01"
+    key = attendance_db.find_student(conn, sid)[0]
+    union = " UNION ALL ".join(f"SELECT * FROM {t}" for t in attendance_db.live_partitions(conn))
+    results = {
+        "duplicate_check_ms": timed(lambda: attendance_db.is_marked(conn, key, last_day), repeat),
+        "month_view_ms": timed(lambda: conn.execute(
+            f"SELECT {attendance_db.READABLE_COLUMNS} FROM {attendance_db.partition_name(last_day)} a "
+            f"JOIN students s ON s.id = a.student WHERE a.day >= ? ORDER BY a.day DESC, a.time DESC",
+            (attendance_db.day_number(month_start),)).fetchall(), repeat),
+        "daily_counts_ms": timed(lambda: conn.execute(
+            f"SELECT day, count(*) FROM ({union}) GROUP BY day").fetchall(), repeat),
+        "student_counts_ms": timed(lambda: conn.execute(
+            f"SELECT s.student_id, s.name, c.n FROM (SELECT student, count(*) AS n FROM ({union}) GROUP BY student) c "
+            f"JOIN students s ON s.id = c.student").fetchall(), repeat),
+    }
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and normalized attendance schemas")
+    parser.add_argument("--rows", type=int, default=10000000, help="Attendance rows to generate")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", help="Where to build the databases (default: a temp dir)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="attendance_schema_")
+    os.makedirs(workdir, exist_ok=True)
+    legacy_path = os.path.join(workdir, "legacy.db")
+    normalized_path = os.path.join(workdir, "normalized.db")
+    for path in (legacy_path, normalized_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    build_legacy(legacy_path, args.rows, args.students)
+    print(f"Built legacy database in {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    build_normalized(normalized_path, args.rows, args.students)
+    print(f"Built normalized database in {time.perf_counter() - start:.1f} s")
+
+    last_day = str(date.today() - timedelta(days=1))
+    results = {"rows": args.rows, "students": args.students}
+    for label, path, queries in (("legacy", legacy_path, legacy_queries),
+                                 ("normalized", normalized_path, normalized_queries)):
+        results[label] = {"size_mb": os.path.getsize(path) / 1024 / 1024}
+        results[label].update(queries(path, last_day, student_id(0), args.repeat))
+
+    print(f"{'':20s} {'legacy':>12s} {'normalized':>12s}")
+    for metric in results["legacy"]:
+        print(f"{metric:20s} {results['legacy'][metric]:12.2f} {results['normalized'][metric]:12.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
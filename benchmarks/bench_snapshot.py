@@ -0,0 +1,133 @@
+"""Time to first recognition after a restart, cold versus warm start.
+
+Each run is a fresh interpreter, as after a kiosk reboot, that runs the
+top-level imports of app.py (read from its source, so the timing follows
+whatever app.py loads at boot) and matches one face encoding:
+
+    cold - unpickle the encodings, build the matcher, resolve the student
+           keys (attendance_db.ensure_students), load the roster and today's
+           present set, as app.py did before the snapshot
+    warm - snapshot.warm_start(): memory-map the saved index, check the
+           checksums and the source stamps, then build the matcher on it
+
+Importing face_recognition (dlib) is timed separately with --face-recognition:
+app.py imports it in the background while the window comes up.
+
+Usage:
+    python benchmarks/bench_snapshot.py
+    python benchmarks/bench_snapshot.py --students 20000 --runs 10 --storage int8
+"""
+import argparse
+import ast
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import build_fixture  # noqa: E402
+
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+{face_recognition}
+{app_imports}
+import attendance_db, recognition, snapshot
+from roster import Roster
+imported = time.perf_counter()
+conn = attendance_db.connect({db!r})
+if {warm!r}:
+    state = snapshot.warm_start(conn, {snapshot_dir!r}, {encodings!r})
+    matcher, keys = state.matcher, state.student_keys
+    rebuilt = state.rebuilt
+else:
+    matcher = recognition.create_matcher(recognition.load_encodings({encodings!r}))
+    keys = attendance_db.ensure_students(conn, [recognition.split_student_key(n) for n in matcher.names])
+    roster = Roster.load(conn)
+    present = attendance_db.present_students(conn)
+    rebuilt = None
+ready = time.perf_counter()
+index, _ = matcher.match(matcher.matcher.encoding(7) if hasattr(matcher, "matcher") else matcher.encoding(7))
+assert keys[index] is not None
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "ready_ms": (ready - imported) * 1000,
+                   "first_match_ms": (done - ready) * 1000, "rebuilt": rebuilt}}))
+"""
+
+
+def app_imports():
+    """The module-level import statements of app.py"""
+    with open(os.path.join(ROOT, "app.py")) as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def run_child(args, fixture_dir, db, snapshot_dir, warm):
+    code = CHILD.format(face_recognition="import face_recognition" if args.face_recognition else "",
+                        app_imports=app_imports(),
+                        db=db, snapshot_dir=snapshot_dir, encodings=os.path.join(fixture_dir, "encodings.pkl"),
+                        warm=warm)
+    env = dict(os.environ, ATTENDANCE_MATCH_STORAGE=args.storage, ATTENDANCE_METRICS="0")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    # From interpreter start: app.py's imports, then the state, then one match
+    result["to_first_recognition_ms"] = result["import_ms"] + result["ready_ms"] + result["first_match_ms"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm start")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--storage", default="float64", help="ATTENDANCE_MATCH_STORAGE for both runs")
+    parser.add_argument("--face-recognition", action="store_true", help="Include importing face_recognition")
+    parser.add_argument("--fixture", help="Fixture directory (default: a temp dir, reused between runs)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    fixture_dir = args.fixture or os.path.join(tempfile.gettempdir(), f"attendance_snapshot_fixture_{args.students}")
+    build_fixture(fixture_dir, students=args.students, rows=args.rows, frames=1)
+    workdir = tempfile.mkdtemp(prefix="attendance_snapshot_")
+    db = os.path.join(workdir, "attendance.db")
+    shutil.copy(os.path.join(fixture_dir, "attendance.db"), db)
+    snapshot_dir = os.path.join(workdir, "snapshot")
+
+    results = {"students": args.students, "storage": args.storage, "face_recognition": args.face_recognition}
+    try:
+        # The first cold run registers the students, the first warm run writes the snapshot
+        run_child(args, fixture_dir, db, snapshot_dir, False)
+        first = run_child(args, fixture_dir, db, snapshot_dir, True)
+        results["snapshot_rebuild"] = first
+        print(f"snapshot written in {first['ready_ms']:.1f} ms (rebuilt: {', '.join(first['rebuilt'])})")
+        print(f"{'start':6s} {'imports ms':>11s} {'ready ms':>9s} {'match ms':>9s} {'to first ms':>12s} {'process ms':>11s}")
+        for warm in (False, True):
+            runs = [run_child(args, fixture_dir, db, snapshot_dir, warm) for _ in range(args.runs)]
+            label = "warm" if warm else "cold"
+            results[label] = {key: float(np.median([r[key] for r in runs]))
+                              for key in ("import_ms", "ready_ms", "first_match_ms", "to_first_recognition_ms",
+                                          "process_ms")}
+            r = results[label]
+            print(f"{label:6s} {r['import_ms']:11.1f} {r['ready_ms']:9.1f} {r['first_match_ms']:9.2f} "
+                  f"{r['to_first_recognition_ms']:12.1f} {r['process_ms']:11.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Synthetic, reproducible fixtures for the benchmark suite.
+
+A fixture is a directory holding:
+    encodings.pkl   - N fake students with random 128-d encodings
+    attendance.db   - the students table plus M attendance rows
+    frames/         - recorded (or generated) camera frames as JPEG files
+    fixture.json    - the parameters used to build it
+
+The same parameters and seed always produce the same fixture, and an
+existing fixture with matching parameters is reused instead of rebuilt.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import recognition  # noqa: E402
+
+# Bump when the database layout changes so cached fixtures are rebuilt
+FIXTURE_VERSION = 4
+ENCODING_SIZE = 128
+# Face box drawn in the middle of every generated frame, as a fraction of (top, right, bottom, left)
+FACE_BOX = (0.25, 0.65, 0.75, 0.35)
+
+
+def student_key(index):
+    """Encodings key in the "<id>_<name>" format used by app.py"""
+    return f"S{index:06d}_Student {index}"
+
+
+def random_encodings(students, seed=0):
+    """Random unit-scale 128-d encodings, similar in spread to real face_recognition output"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.09, size=(students, ENCODING_SIZE))
+
+
+def probe_encodings(known, count, seed=0, unknown_ratio=0.2):
+    """Noisy copies of known encodings plus some strangers, for matching benchmarks"""
+    rng = np.random.default_rng(seed + 1)
+    probes = []
+    for _ in range(count):
+        if rng.random() < unknown_ratio:
+            probes.append(rng.normal(0.0, 0.09, size=ENCODING_SIZE))
+        else:
+            probes.append(known[rng.integers(len(known))] + rng.normal(0.0, 0.01, size=ENCODING_SIZE))
+    return np.array(probes)
+
+
+def face_box(width, height):
+    """The (top, right, bottom, left) face box drawn on generated frames"""
+    top, right, bottom, left = FACE_BOX
+    return (int(top * height), int(right * width), int(bottom * height), int(left * width))
+
+
+def generate_frame(rng, width, height):
+    """A noisy frame with a face-like blob in the middle"""
+    frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    top, right, bottom, left = face_box(width, height)
+    center = ((left + right) // 2, (top + bottom) // 2)
+    axes = ((right - left) // 2, (bottom - top) // 2)
+    cv2.ellipse(frame, center, axes, 0, 0, 360, (140, 170, 210), -1)
+    cv2.circle(frame, (center[0] - axes[0] // 3, center[1] - axes[1] // 4), axes[0] // 8, (40, 40, 40), -1)
+    cv2.circle(frame, (center[0] + axes[0] // 3, center[1] - axes[1] // 4), axes[0] // 8, (40, 40, 40), -1)
+    return frame
+
+
+def build_attendance_db(path, names, rows, seed=0):
+    """Create the database with every student registered and `rows` attendance records"""
+    rng = np.random.default_rng(seed + 2)
+    attendance_db.init_db(path)
+    conn = sqlite3.connect(path)
+    start = date.today() - timedelta(days=max(rows // max(len(names), 1), 1))
+
+    student_rows = []
+    for key in names:
+        student_id, name = recognition.split_student_key(key)
+        student_rows.append((student_id, name, str(start)))
+    conn.executemany("INSERT INTO students (student_id, name, registered_date) VALUES (?, ?, ?)", student_rows)
+    keys = attendance_db.ensure_students(conn, [(student_id, name) for student_id, name, _ in student_rows])
+
+    # Fill whole days with a random subset of students until we have `rows` records
+    attendance_rows = []
+    day = start
+    while len(attendance_rows) < rows:
+        present = rng.permutation(len(names))[:min(len(names), rows - len(attendance_rows))]
+        present = present[:max(1, int(len(present) * rng.uniform(0.7, 1.0)))]
+        for index in present:
+            seconds = 8 * 3600 + int(rng.integers(0, 4 * 3600))
+            attendance_rows.append((keys[index], attendance_db.day_number(day), seconds))
+        day += timedelta(days=1)
+    attendance_db.mark_present_many(conn, attendance_rows[:rows], commit=False)
+    conn.commit()
+    conn.close()
+
+
+def build_fixture(directory, students=500, rows=20000, frames=30, width=640, height=480,
+                  seed=0, frames_dir=None):
+    """Build (or reuse) a fixture directory and return its metadata"""
+    params = {"version": FIXTURE_VERSION, "students": students, "rows": rows, "frames": frames, "width": width, "height": height,
+              "seed": seed, "frames_dir": frames_dir}
+    meta_path = os.path.join(directory, "fixture.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == params:
+                return params
+        shutil.rmtree(directory)
+
+    os.makedirs(os.path.join(directory, "frames"), exist_ok=True)
+
+    names = [student_key(i) for i in range(students)]
+    encodings = random_encodings(students, seed)
+    recognition.save_encodings(dict(zip(names, encodings)), os.path.join(directory, "encodings.pkl"))
+
+    build_attendance_db(os.path.join(directory, "attendance.db"), names, rows, seed)
+
+    if frames_dir:
+        # Recorded frames: copy them in so the fixture is self-contained
+        recorded = sorted(f for f in os.listdir(frames_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for image_name in recorded[:frames]:
+            shutil.copy(os.path.join(frames_dir, image_name), os.path.join(directory, "frames", image_name))
+    else:
+        rng = np.random.default_rng(seed + 3)
+        for i in range(frames):
+            cv2.imwrite(os.path.join(directory, "frames", f"{i:04d}.jpg"), generate_frame(rng, width, height))
+
+    with open(meta_path, "w") as f:
+        json.dump(params, f, indent=2)
+    return params
+
+
+def load_frames(directory):
+    """Load the fixture frames as BGR arrays"""
+    frames_dir = os.path.join(directory, "frames")
+    return [cv2.imread(os.path.join(frames_dir, f)) for f in sorted(os.listdir(frames_dir))]
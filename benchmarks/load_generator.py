@@ -0,0 +1,159 @@
+"""Load generator for the attendance ingest service (server.py).
+
+Simulates many camera clients posting encodings (or JPEG frames) over
+keep-alive connections and reports requests per second and latency
+percentiles. With --spawn-server it builds a synthetic fixture, starts
+server.py on localhost against it and shuts it down afterwards, so the
+whole test runs on one machine.
+
+Usage:
+    python benchmarks/load_generator.py --spawn-server --clients 32 --duration 10
+    python benchmarks/load_generator.py --port 8765 --clients 8 --frames-dir data/bench_faces
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import recognition  # noqa: E402
+from fixtures import build_fixture, probe_encodings  # noqa: E402
+
+
+async def post(reader, writer, path, body, content_type, camera):
+    """Send one keep-alive POST and return (status, body)"""
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+                 f"X-Camera: {camera}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode().partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, camera, payloads, deadline, latencies, errors):
+    """One camera station posting back to back until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            path, body, content_type = payloads[i % len(payloads)]
+            i += 1
+            start = time.perf_counter()
+            status, _ = await post(reader, writer, path, body, content_type, camera)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def build_payloads(args, known):
+    """Request bodies: JSON encodings, or JPEG frames from a directory"""
+    if args.frames_dir:
+        frames = sorted(f for f in os.listdir(args.frames_dir) if f.lower().endswith(('.jpg', '.jpeg')))
+        payloads = []
+        for name in frames:
+            with open(os.path.join(args.frames_dir, name), "rb") as f:
+                payloads.append(("/frames", f.read(), "image/jpeg"))
+        return payloads
+
+    probes = probe_encodings(known, 512, args.seed)
+    return [("/encodings", json.dumps({"encodings": probes[i:i + args.faces].tolist()}).encode(), "application/json")
+            for i in range(0, len(probes), args.faces)]
+
+
+async def wait_for_server(host, port, timeout=30):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"Server did not start on {host}:{port}")
+
+
+async def run(args, known):
+    payloads = build_payloads(args, known)
+    await wait_for_server(args.host, args.port)
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args.host, args.port, f"cam-{i}", payloads, deadline, latencies, errors)
+                           for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    samples = np.array(latencies) * 1000
+    return {
+        "clients": args.clients,
+        "faces_per_request": None if args.frames_dir else args.faces,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "duration_s": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms_p50": float(np.percentile(samples, 50)) if len(samples) else None,
+        "latency_ms_p95": float(np.percentile(samples, 95)) if len(samples) else None,
+        "latency_ms_p99": float(np.percentile(samples, 99)) if len(samples) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the attendance ingest service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent camera clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--faces", type=int, default=1, help="Encodings per request")
+    parser.add_argument("--frames-dir", help="Post JPEG frames from this directory instead of encodings")
+    parser.add_argument("--spawn-server", action="store_true", help="Start server.py on a synthetic fixture")
+    parser.add_argument("--students", type=int, default=1000, help="Fixture size when spawning the server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    fixture_dir = os.path.join(tempfile.gettempdir(), "attendance_load_fixture")
+    build_fixture(fixture_dir, students=args.students, rows=0, frames=0, seed=args.seed)
+    known = np.array(list(recognition.load_encodings(os.path.join(fixture_dir, "encodings.pkl")).values()))
+
+    server = None
+    if args.spawn_server:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="attendance_load_"), "attendance.db")
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--host", args.host,
+                                   "--port", str(args.port), "--encodings",
+                                   os.path.join(fixture_dir, "encodings.pkl"), "--db", db_path],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        results = asyncio.run(run(args, known))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"{results['requests']} requests from {results['clients']} clients in {results['duration_s']:.1f} s: "
+          f"{results['requests_per_second']:.0f} req/s, p50 {results['latency_ms_p50']:.2f} ms, "
+          f"p99 {results['latency_ms_p99']:.2f} ms, {results['errors']} errors")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""Headless benchmark suite for the whole recognition pipeline.
+
+Times every stage of the attendance pipeline on a synthetic fixture (see
+fixtures.py) without a camera or a display, and writes the results to JSON
+so they can be compared across versions.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output bench_output.json
+    python benchmarks/run_benchmarks.py --students 2000 --rows 100000 --detector haar
+    python benchmarks/run_benchmarks.py --compare baseline.json --threshold 1.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import attendance_db  # noqa: E402
+import liveness  # noqa: E402
+import recognition  # noqa: E402
+import report_cache  # noqa: E402
+import reports  # noqa: E402
+import settings  # noqa: E402
+from detectors import create_detector  # noqa: E402
+from fixtures import build_fixture, face_box, load_frames, probe_encodings  # noqa: E402
+from preprocess import FramePreprocessor  # noqa: E402
+from roster import AttendanceWriter, Roster  # noqa: E402
+
+
+class StageSkipped(Exception):
+    """Raised by a stage that cannot run in this environment"""
+
+
+def summarize(samples):
+    """Latency statistics in milliseconds"""
+    samples = np.array(samples) * 1000
+    return {
+        "n": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples.min()),
+        "max_ms": float(samples.max()),
+    }
+
+
+def time_calls(fn, items):
+    """Call fn once per item and return the per-call timings in seconds"""
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# ---------- Stages ----------
+def stage_startup(ctx):
+    """Cold start of a fresh interpreter up to a ready matcher and database"""
+    script = (
+        "import cv2, numpy, pandas\n"
+        "try:\n    import face_recognition\nexcept ImportError:\n    pass\n"
+        "import attendance_db, recognition\n"
+        f"attendance_db.init_db({ctx['db']!r})\n"
+        f"recognition.create_matcher(recognition.load_encodings({ctx['encodings']!r}), cache=False)\n"
+    )
+    samples = []
+    for _ in range(ctx["startup_runs"]):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def stage_startup_warm(ctx):
+    """Fresh interpreter up to a ready matcher, student keys, roster and present set from the snapshot"""
+    script = (
+        "import cv2, numpy, pandas\n"
+        "try:\n    import face_recognition\nexcept ImportError:\n    pass\n"
+        "import attendance_db, snapshot\n"
+        f"attendance_db.init_db({ctx['db']!r})\n"
+        f"state = snapshot.warm_start(attendance_db.connect({ctx['db']!r}), {ctx['snapshot']!r}, {ctx['encodings']!r})\n"
+        "state.matcher\n"
+    )
+    # The first run writes the snapshot
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+    samples = []
+    for _ in range(ctx["startup_runs"]):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def stage_encoding_load(ctx):
+    def load(_):
+        ctx["matcher"] = recognition.create_matcher(recognition.load_encodings(ctx["encodings"]), cache=False)
+    return time_calls(load, range(ctx["repeat"]))
+
+
+def stage_preprocess(ctx):
+    """FramePreprocessor as in app.py: detector input, plus the RGB frame the encoder needs"""
+    try:
+        ctx["face_detector"] = create_detector(ctx["detector"])
+        color = ctx["face_detector"].color
+    except (ImportError, FileNotFoundError, ValueError) as e:
+        # Detection is skipped with this error, the encoder still needs RGB frames
+        ctx["face_detector"], color = e, "rgb"
+    preprocessor = FramePreprocessor(color)
+    ctx["process_scale"] = preprocessor.scale
+    ctx["small_frames"] = []
+    samples = []
+    for frame in ctx["frames"]:
+        start = time.perf_counter()
+        detector_input = preprocessor.process(frame)
+        rgb = preprocessor.rgb()
+        samples.append(time.perf_counter() - start)
+        # The buffers are refilled by the next frame, keep copies for the later stages
+        rgb = rgb.copy()
+        ctx["small_frames"].append((rgb if color == "rgb" else detector_input.copy(), rgb))
+    return samples
+
+
+def stage_detection(ctx):
+    detector = ctx["face_detector"]
+    if isinstance(detector, Exception):
+        raise StageSkipped(str(detector))
+    return time_calls(detector.detect, [detector_input for detector_input, _ in ctx["small_frames"]])
+
+
+def stage_encoding(ctx):
+    try:
+        import face_recognition
+    except ImportError as e:
+        raise StageSkipped(str(e))
+    _, rgb = ctx["small_frames"][0]
+    location = [face_box(rgb.shape[1], rgb.shape[0])]
+    return time_calls(lambda item: face_recognition.face_encodings(item[1], location), ctx["small_frames"])
+
+
+def stage_liveness(ctx):
+    """Anti-spoof check cost per recognized face (texture only without face_recognition)"""
+    # Full mode whatever ATTENDANCE_LIVENESS is, the default (off) would time nothing
+    checker = liveness.LivenessChecker(mode="full", window=float("inf"))
+    ctx["liveness_mode"] = checker.mode
+    height, width = ctx["frames"][0].shape[:2]
+    box = face_box(width, height)
+    small_box = tuple(int(value * ctx["process_scale"]) for value in box)
+    items = list(zip(ctx["frames"], ctx["small_frames"]))
+
+    def check(item):
+        frame, (_, rgb) = item
+        checker.tracks.clear()  # Every call is a new candidate that runs all tiers
+        checker.check("bench", frame, box, rgb, small_box)
+    return time_calls(check, items)
+
+
+def stage_matching(ctx):
+    return time_calls(ctx["matcher"].match, ctx["probes"])
+
+
+def stage_matching_cached(ctx):
+    """Matching through the MatchCache, each probe seen for several consecutive frames"""
+    cache = recognition.MatchCache(ctx["matcher"])
+    rng = np.random.default_rng(1)
+    burst = [probe + rng.normal(0.0, 0.005, size=probe.shape)
+             for probe in ctx["probes"] for _ in range(ctx["burst"])]
+    samples = time_calls(cache.match, burst)
+    ctx["cache_stats"] = cache.stats()
+    return samples
+
+
+def student_keys(conn, ctx):
+    """Integer student keys in matcher order"""
+    return attendance_db.ensure_students(conn, [recognition.split_student_key(n) for n in ctx["matcher"].names])
+
+
+def stage_duplicate_check(ctx):
+    conn = attendance_db.connect(ctx["db"])
+    rng = np.random.default_rng(0)
+    days = [attendance_db.day_number() - int(d) for d in rng.integers(0, 30, size=ctx["db_ops"])]
+    keys = student_keys(conn, ctx)
+    checks = [(keys[int(i)], day) for i, day in zip(rng.integers(0, len(keys), size=ctx["db_ops"]), days)]
+    samples = time_calls(lambda check: attendance_db.is_marked(conn, *check), checks)
+    conn.close()
+    return samples
+
+
+def stage_db_insert(ctx):
+    conn = attendance_db.connect(ctx["db"])
+    keys = student_keys(conn, ctx)
+    inserts = [keys[i % len(keys)] for i in range(ctx["db_ops"])]
+    samples = time_calls(lambda student: attendance_db.mark_present(conn, student), inserts)
+    conn.close()
+    return samples
+
+
+def stage_quick_entry(ctx):
+    """Quick entry acknowledgement: autocomplete, roster lookup and queued mark per scanned ID"""
+    conn = attendance_db.connect(ctx["db"])
+    roster = Roster.load(conn)
+    conn.close()
+    writer = AttendanceWriter(ctx["db"])
+    ids = [recognition.split_student_key(name)[0] for name in ctx["matcher"].names]
+    rng = np.random.default_rng(0)
+    scans = [ids[int(i)] for i in rng.integers(0, len(ids), size=ctx["db_ops"])]
+
+    def scan(student_id):
+        roster.complete(student_id[:3])
+        writer.mark(roster.get(student_id)[0])
+    samples = time_calls(scan, scans)
+    writer.close()
+    return samples
+
+
+def stage_view_query(ctx):
+    def view(_):
+        conn = attendance_db.connect(ctx["db"])
+        attendance_db.fetch_attendance(conn)
+        conn.close()
+    return time_calls(view, range(ctx["repeat"]))
+
+
+def stage_report_query(ctx):
+    def report(_):
+        conn = attendance_db.connect(ctx["db"])
+        reports.build_statistics_report(attendance_db.fetch_attendance(conn))
+        conn.close()
+    return time_calls(report, range(ctx["repeat"]))
+
+
+def stage_report_cached(ctx):
+    """Statistics report repeated with no writes in between"""
+    cache = report_cache.ReportCache()
+    conn = attendance_db.connect(ctx["db"])
+    cache.statistics(conn)
+    samples = time_calls(lambda _: cache.statistics(conn), range(ctx["repeat"]))
+    conn.close()
+    return samples
+
+
+def stage_report_incremental(ctx):
+    """Statistics report after each new mark: only the written partition is re-read"""
+    cache = report_cache.ReportCache()
+    conn = attendance_db.connect(ctx["db"])
+    keys = student_keys(conn, ctx)
+    # Past the end of the fixture so every mark is a new row in one partition
+    day = attendance_db.day_number() + 400
+    attendance_db.mark_present(conn, keys[-1], day)
+    cache.statistics(conn)
+
+    def report(i):
+        attendance_db.mark_present(conn, keys[i % len(keys)], day)
+        cache.statistics(conn)
+    samples = time_calls(report, range(ctx["repeat"]))
+    ctx["report_cache_stats"] = cache.stats()
+    conn.close()
+    return samples
+
+
+def stage_export_query(ctx):
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError as e:
+        raise StageSkipped(str(e))
+
+    def export(_):
+        conn = attendance_db.connect(ctx["db"])
+        attendance_df = attendance_db.fetch_attendance(conn)
+        students_df = attendance_db.fetch_students(conn)
+        conn.close()
+        reports.export_to_excel(os.path.join(ctx["workdir"], "export.xlsx"), attendance_df, students_df)
+    return time_calls(export, range(max(1, ctx["repeat"] // 2)))
+
+
+STAGES = [
+    ("startup", stage_startup),
+    ("startup_warm", stage_startup_warm),
+    ("encoding_load", stage_encoding_load),
+    ("preprocess", stage_preprocess),
+    ("detection", stage_detection),
+    ("encoding", stage_encoding),
+    ("matching", stage_matching),
+    ("matching_cached", stage_matching_cached),
+    ("duplicate_check", stage_duplicate_check),
+    ("liveness", stage_liveness),
+    ("db_insert", stage_db_insert),
+    ("quick_entry", stage_quick_entry),
+    ("view_query", stage_view_query),
+    ("report_query", stage_report_query),
+    ("report_cached", stage_report_cached),
+    ("report_incremental", stage_report_incremental),
+    ("export_query", stage_export_query),
+]
+
+
+# ---------- Runner ----------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    fixture_dir = args.fixture or os.path.join(tempfile.gettempdir(), "attendance_bench_fixture")
+    params = build_fixture(fixture_dir, students=args.students, rows=args.rows, frames=args.frames,
+                           width=args.width, height=args.height, seed=args.seed, frames_dir=args.frames_dir)
+
+    # Work on a copy of the database so the fixture stays reproducible
+    workdir = tempfile.mkdtemp(prefix="attendance_bench_")
+    db_path = os.path.join(workdir, "attendance.db")
+    shutil.copy(os.path.join(fixture_dir, "attendance.db"), db_path)
+
+    known = np.array(list(recognition.load_encodings(os.path.join(fixture_dir, "encodings.pkl")).values()))
+    ctx = {
+        "workdir": workdir,
+        "db": db_path,
+        "encodings": os.path.join(fixture_dir, "encodings.pkl"),
+        "snapshot": os.path.join(workdir, "snapshot"),
+        "frames": load_frames(fixture_dir),
+        "probes": probe_encodings(known, args.probes, args.seed),
+        "detector": args.detector,
+        "repeat": args.repeat,
+        "db_ops": args.db_ops,
+        "startup_runs": args.startup_runs,
+        "burst": args.burst,
+    }
+
+    only = set(args.stages.split(",")) if args.stages else None
+    stages = {}
+    try:
+        for name, fn in STAGES:
+            if only and name not in only and name not in ("encoding_load", "preprocess"):
+                continue
+            try:
+                stages[name] = summarize(fn(ctx))
+                print(f"{name:16s} {stages[name]['mean_ms']:10.3f} ms mean  {stages[name]['p95_ms']:10.3f} ms p95")
+            except StageSkipped as e:
+                stages[name] = {"skipped": str(e)}
+                print(f"{name:16s} skipped: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "fixture": params,
+        "detector": args.detector,
+        "match_storage": settings.MATCH_STORAGE,
+        "liveness_mode": ctx.get("liveness_mode"),
+        "stages": stages,
+        "match_cache": ctx.get("cache_stats"),
+        "report_cache": ctx.get("report_cache_stats"),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change against a previous run, return the list of regressed stages"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["stages"]
+
+    regressions = []
+    for name, current in results["stages"].items():
+        previous = baseline.get(name, {})
+        if "mean_ms" not in current or "mean_ms" not in previous or not previous["mean_ms"]:
+            continue
+        ratio = current["mean_ms"] / previous["mean_ms"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:16s} {previous['mean_ms']:10.3f} -> {current['mean_ms']:10.3f} ms  x{ratio:5.2f} {flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the attendance recognition pipeline headlessly")
+    parser.add_argument("--students", type=int, default=500, help="Number of fake students (N)")
+    parser.add_argument("--rows", type=int, default=20000, help="Number of attendance rows (M)")
+    parser.add_argument("--frames", type=int, default=30, help="Number of frames to generate or load")
+    parser.add_argument("--frames-dir", help="Use recorded frames from this directory instead of generated ones")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture", help="Fixture directory (reused when the parameters match)")
+    parser.add_argument("--detector", default="haar", help="Detector backend for the detection stage")
+    parser.add_argument("--probes", type=int, default=1000, help="Encodings to match in the matching stage")
+    parser.add_argument("--burst", type=int, default=5, help="Consecutive frames per face for the cached matching stage")
+    parser.add_argument("--db-ops", type=int, default=500, help="Duplicate checks and inserts to time")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for the load and query stages")
+    parser.add_argument("--startup-runs", type=int, default=3, help="Fresh interpreters to start")
+    parser.add_argument("--stages", help="Comma separated subset of stages to run")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
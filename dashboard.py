@@ -0,0 +1,256 @@
+"""Live attendance dashboard fed by marking events.
+
+Every marking path (the face recognition loop in app.py, quick and manual
+entry through roster.AttendanceWriter, and server.py) publishes an event
+for each newly marked student. Subscribers keep O(1) running aggregates:
+
+    present / absent today
+    arrivals per minute over the last hour (ring buffer of minute slots)
+    arrivals per minute for each camera (exponentially decayed rate)
+
+The Tk window drains its queue on a throttled timer and only redraws the
+changed bars with matplotlib blitting, so it never queries the database or
+rebuilds the figure while the gate is busy. Publishing is a no-op while
+nobody is subscribed.
+"""
+import math
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+import attendance_db
+import settings
+
+Event = namedtuple("Event", "kind at student camera")
+MARKED = "marked"
+REGISTERED = "registered"
+
+HISTORY_MINUTES = 60
+# Time constant of the per-camera rates in seconds
+RATE_WINDOW = 300.0
+
+
+class EventStream:
+    """Fan-out of attendance events to bounded subscriber queues"""
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, maxsize=10000):
+        subscriber = queue.Queue(maxsize)
+        with self._lock:
+            # Copy on write so publish() can iterate without the lock
+            self._subscribers = self._subscribers + [subscriber]
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+
+    def publish(self, event):
+        for subscriber in self._subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass  # A stalled dashboard must never block marking
+
+
+stream = EventStream()
+
+
+def publish(kind, student=None, camera=None, at=None):
+    """Publish an attendance event to every subscriber"""
+    if stream._subscribers:
+        stream.publish(Event(kind, time.time() if at is None else at, student, camera))
+
+
+class LiveStats:
+    """Incremental aggregates over the event stream, O(1) per event"""
+
+    def __init__(self, total_students=0, present=0, day=None):
+        self.total_students = total_students
+        self.present = present
+        self.day = attendance_db.day_number() if day is None else day
+        self.minute_counts = np.zeros(HISTORY_MINUTES, dtype=np.int64)
+        self.minute_stamps = np.full(HISTORY_MINUTES, -1, dtype=np.int64)
+        # camera -> [marked today, decayed rate per minute, time of last update]
+        self.cameras = {}
+
+    @classmethod
+    def from_db(cls, conn, total_students):
+        """Start from today's rows, the only query the dashboard makes"""
+        day = attendance_db.day_number()
+        times = attendance_db.arrival_times(conn, day)
+        stats = cls(total_students, len(times), day)
+        midnight = time.mktime(date.today().timetuple())
+        for seconds in times:
+            stats._count_minute(midnight + seconds)
+        return stats
+
+    def _roll_day(self, at):
+        day = attendance_db.day_number(date.fromtimestamp(at))
+        if day != self.day:
+            self.day = day
+            self.present = 0
+            for camera in self.cameras.values():
+                camera[0] = 0
+
+    def _count_minute(self, at):
+        minute = int(at // 60)
+        slot = minute % HISTORY_MINUTES
+        if self.minute_stamps[slot] != minute:
+            self.minute_stamps[slot] = minute
+            self.minute_counts[slot] = 0
+        self.minute_counts[slot] += 1
+
+    def add(self, event):
+        if event.kind == REGISTERED:
+            self.total_students += 1
+            return
+        self._roll_day(event.at)
+        self.present += 1
+        self._count_minute(event.at)
+        if event.camera is not None:
+            camera = self.cameras.setdefault(event.camera, [0, 0.0, event.at])
+            camera[0] += 1
+            camera[1] = camera[1] * math.exp(-(event.at - camera[2]) / RATE_WINDOW) + 60.0 / RATE_WINDOW
+            camera[2] = event.at
+
+    @property
+    def absent(self):
+        return max(self.total_students - self.present, 0)
+
+    def arrivals_per_minute(self, now=None):
+        """Arrivals in each of the last HISTORY_MINUTES minutes, oldest first"""
+        minute = int((time.time() if now is None else now) // 60)
+        minutes = np.arange(minute - HISTORY_MINUTES + 1, minute + 1)
+        slots = minutes % HISTORY_MINUTES
+        return np.where(self.minute_stamps[slots] == minutes, self.minute_counts[slots], 0)
+
+    def camera_rates(self, now=None):
+        """{camera: (marked today, arrivals per minute)}"""
+        now = time.time() if now is None else now
+        return {name: (count, rate * math.exp(-max(now - last, 0.0) / RATE_WINDOW))
+                for name, (count, rate, last) in self.cameras.items()}
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        self._roll_day(now)
+        return {
+            "day": attendance_db.day_string(self.day),
+            "students": self.total_students,
+            "present": self.present,
+            "absent": self.absent,
+            "arrivals_per_minute": self.arrivals_per_minute(now).tolist(),
+            "cameras": {name: {"marked": count, "per_minute": round(rate, 2)}
+                        for name, (count, rate) in self.camera_rates(now).items()},
+        }
+
+
+class DashboardWindow:
+    """Tk window showing LiveStats, redrawn on a throttled timer with blitting"""
+
+    def __init__(self, parent, stats, interval_ms=None):
+        import tkinter as tk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.stats = stats
+        self.interval = interval_ms or settings.DASHBOARD_REFRESH_MS
+        self.events = stream.subscribe()
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Live Attendance")
+        self.window.geometry("700x520")
+        self.summary = tk.Label(self.window, font=("Arial", 16, "bold"))
+        self.summary.pack(pady=10)
+
+        self.figure = Figure(figsize=(6.5, 3), dpi=100)
+        self.axes = self.figure.add_subplot(111)
+        self.axes.set_title("Arrivals per minute (last hour)")
+        self.axes.set_xlim(-HISTORY_MINUTES + 0.5, 0.5)
+        self.axes.set_ylim(0, 5)
+        self.axes.set_xlabel("Minutes ago")
+        self.bars = self.axes.bar(np.arange(-HISTORY_MINUTES + 1, 1), np.zeros(HISTORY_MINUTES),
+                                  width=0.8, color='#27ae60', animated=True)
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill='both', expand=True, padx=10)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+        self.cameras_label = tk.Label(self.window, font=("Arial", 11), justify='left')
+        self.cameras_label.pack(pady=10)
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.minute = None
+        self._update_labels()
+        self.canvas.draw()
+        self.after_id = self.window.after(self.interval, self._tick)
+
+    def _on_draw(self, event):
+        """Full redraws (first draw, resize, new y-limit) refresh the cached background"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._blit_bars()
+
+    def _blit_bars(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for bar in self.bars:
+            self.axes.draw_artist(bar)
+        self.canvas.blit(self.figure.bbox)
+
+    def _tick(self):
+        changed = False
+        while True:
+            try:
+                self.stats.add(self.events.get_nowait())
+            except queue.Empty:
+                break
+            changed = True
+
+        # Redraw on new events, and once a minute so the history scrolls
+        minute = int(time.time() // 60)
+        if changed or minute != self.minute:
+            self.minute = minute
+            self._update_labels()
+            self._update_bars()
+        self.after_id = self.window.after(self.interval, self._tick)
+
+    def _update_labels(self):
+        self.summary.config(text=f"Present today: {self.stats.present}    Absent: {self.stats.absent}")
+        rates = self.stats.camera_rates()
+        lines = [f"{name}: {count} marked, {rate:.1f}/min" for name, (count, rate) in sorted(rates.items())]
+        self.cameras_label.config(text="\n".join(lines) or "No camera arrivals yet")
+
+    def _update_bars(self):
+        counts = self.stats.arrivals_per_minute()
+        for bar, count in zip(self.bars, counts):
+            bar.set_height(count)
+        top = self.axes.get_ylim()[1]
+        if counts.max() > top:
+            # Only a new scale needs a full redraw
+            self.axes.set_ylim(0, counts.max() * 1.5)
+            self.canvas.draw()
+        else:
+            self._blit_bars()
+
+    def close(self):
+        self.window.after_cancel(self.after_id)
+        stream.unsubscribe(self.events)
+        self.window.destroy()
+
+
+def open_dashboard(parent, total_students):
+    """Open the live dashboard window seeded with today's attendance"""
+    conn = attendance_db.connect()
+    stats = LiveStats.from_db(conn, total_students)
+    conn.close()
+    return DashboardWindow(parent, stats)
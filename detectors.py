@@ -0,0 +1,184 @@
+"""Interchangeable face detection backends.
+
+All detectors return face locations in the same (top, right, bottom, left)
+format as face_recognition.face_locations, so their output can be passed
+straight to face_recognition.face_encodings.
+
+Backends:
+    hog    - dlib HOG detector through face_recognition (the original behaviour)
+    haar   - OpenCV Haar cascade (ships with opencv-python)
+    lbp    - OpenCV LBP cascade (needs a local .xml cascade file)
+    yunet  - OpenCV DNN YuNet (needs a local .onnx model file)
+    ssd    - OpenCV DNN ResNet-10 SSD (needs a local .prototxt + .caffemodel)
+"""
+import os
+
+import cv2
+
+import settings
+
+# ---------- Base Class ----------
+class FaceDetector:
+    """Common interface for all face detectors"""
+
+    name = "base"
+    # Colour layout the detector expects: "rgb", "bgr" or "gray"
+    color = "rgb"
+
+    def prepare(self, bgr_image, rgb_image=None):
+        """Convert a BGR frame into the layout this detector expects"""
+        if self.color == "rgb":
+            return rgb_image if rgb_image is not None else cv2.cvtColor(bgr_image, cv2.COLOR_BGR2RGB)
+        if self.color == "gray":
+            return cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
+        return bgr_image
+
+    def detect(self, image):
+        """Return a list of (top, right, bottom, left) boxes for one image"""
+        raise NotImplementedError
+
+    def detect_batch(self, images):
+        """Return one list of boxes per image"""
+        return [self.detect(image) for image in images]
+
+
+def _clip_box(top, right, bottom, left, height, width):
+    """Clip a box to the image bounds"""
+    return (max(int(top), 0), min(int(right), width), min(int(bottom), height), max(int(left), 0))
+
+
+def _xywh_to_css(boxes, height, width):
+    """Convert OpenCV (x, y, w, h) boxes to (top, right, bottom, left)"""
+    return [_clip_box(y, x + w, y + h, x, height, width) for (x, y, w, h) in boxes]
+
+
+def _model_path(filename):
+    """Resolve a model file inside the models directory"""
+    return os.path.join(settings.MODELS_DIR, filename)
+
+
+def _require_file(path, backend):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file for the '{backend}' detector not found: {path}")
+    return path
+
+# ---------- dlib HOG ----------
+class HogDetector(FaceDetector):
+    """dlib HOG detector used by face_recognition (original behaviour)"""
+
+    name = "hog"
+    color = "rgb"
+
+    def __init__(self, upsample=1):
+        import face_recognition
+        self._face_locations = face_recognition.face_locations
+        self.upsample = upsample
+
+    def detect(self, image):
+        return self._face_locations(image, number_of_times_to_upsample=self.upsample, model="hog")
+
+# ---------- OpenCV Cascades ----------
+class CascadeDetector(FaceDetector):
+    """OpenCV Haar or LBP cascade classifier"""
+
+    color = "gray"
+
+    def __init__(self, kind="haar", model=None, scale_factor=1.1, min_neighbors=5, min_size=(20, 20)):
+        if model is None:
+            if kind == "haar":
+                model = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+            else:
+                model = _model_path("lbpcascade_frontalface_improved.xml")
+        _require_file(model, kind)
+
+        self.name = kind
+        self.classifier = cv2.CascadeClassifier(model)
+        if self.classifier.empty():
+            raise ValueError(f"Could not load cascade file: {model}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image):
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = self.classifier.detectMultiScale(image, scaleFactor=self.scale_factor,
+                                                 minNeighbors=self.min_neighbors, minSize=self.min_size)
+        height, width = image.shape[:2]
+        return _xywh_to_css(boxes, height, width)
+
+# ---------- OpenCV DNN ----------
+class YuNetDetector(FaceDetector):
+    """OpenCV DNN YuNet detector (cv2.FaceDetectorYN)"""
+
+    name = "yunet"
+    color = "bgr"
+
+    def __init__(self, model=None, confidence=0.6, nms_threshold=0.3):
+        model = _require_file(model or _model_path("face_detection_yunet_2023mar.onnx"), self.name)
+        self.net = cv2.FaceDetectorYN.create(model, "", (320, 320), confidence, nms_threshold)
+        self._input_size = (320, 320)
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        if self._input_size != (width, height):
+            self.net.setInputSize((width, height))
+            self._input_size = (width, height)
+        _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        return _xywh_to_css(faces[:, :4], height, width)
+
+
+class SsdDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD detector with true batched inference"""
+
+    name = "ssd"
+    color = "bgr"
+    input_size = (300, 300)
+    mean = (104.0, 177.0, 123.0)
+
+    def __init__(self, model=None, config=None, confidence=0.6):
+        model = _require_file(model or _model_path("res10_300x300_ssd_iter_140000.caffemodel"), self.name)
+        config = _require_file(config or _model_path("deploy.prototxt"), self.name)
+        self.net = cv2.dnn.readNetFromCaffe(config, model)
+        self.confidence = confidence
+
+    def detect(self, image):
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images):
+        if not images:
+            return []
+        blob = cv2.dnn.blobFromImages(images, 1.0, self.input_size, self.mean)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        results = [[] for _ in images]
+        for image_id, _, score, x1, y1, x2, y2 in detections:
+            if score < self.confidence:
+                continue
+            image_id = int(image_id)
+            height, width = images[image_id].shape[:2]
+            results[image_id].append(_clip_box(y1 * height, x2 * width, y2 * height, x1 * width, height, width))
+        return results
+
+# ---------- Factory ----------
+BACKENDS = ("hog", "haar", "lbp", "yunet", "ssd")
+
+
+def create_detector(backend=None, model=None, confidence=None):
+    """Create the detector configured for this deployment"""
+    backend = (backend or settings.DETECTOR_BACKEND).lower()
+    model = model or settings.DETECTOR_MODEL or None
+    confidence = settings.DETECTOR_CONFIDENCE if confidence is None else confidence
+
+    if backend == "hog":
+        return HogDetector()
+    if backend in ("haar", "lbp"):
+        return CascadeDetector(kind=backend, model=model)
+    if backend == "yunet":
+        return YuNetDetector(model=model, confidence=confidence)
+    if backend == "ssd":
+        return SsdDetector(model=model, confidence=confidence)
+    raise ValueError(f"Unknown detector backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
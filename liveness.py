@@ -0,0 +1,219 @@
+"""Tiered liveness (anti-spoof) check for recognized faces.
+
+Runs only after a confident match of a student who is not yet marked, and
+before the database insert, so it adds nothing to frames without a new
+candidate. Evidence is collected per (camera, student) track across frames:
+
+    texture  - Laplacian variance and the share of high-frequency FFT energy
+               of the face crop; printed photos are flat or blurred, screens
+               add moire patterns (cheap, every frame)
+    temporal - 68-point landmarks on the downscaled frame: an eye blink
+               (eye aspect ratio closing then reopening) or landmark motion
+               that no homography explains, which a photo moved or tilted
+               in front of the camera does not have (only while the texture
+               check passes)
+
+check() returns LIVE, SPOOF or PENDING (keep watching). Each call stops
+starting new tiers once ATTENDANCE_LIVENESS_BUDGET_MS is spent. The
+thresholds are heuristics; calibrate them for the cameras with
+benchmarks/bench_liveness.py --frames-dir.
+"""
+import functools
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+import settings
+
+LIVE = "live"
+SPOOF = "spoof"
+PENDING = "pending"
+
+MODES = ("off", "texture", "full")
+CROP_SIZE = 64
+# Eye aspect ratio below CLOSED counts as closed, above OPEN as open again
+EYE_CLOSED = 0.21
+EYE_OPEN = 0.25
+# Texture votes needed before deciding
+MIN_TEXTURE_VOTES = 2
+
+
+@functools.lru_cache(maxsize=4)
+def _high_frequency_mask(size):
+    """Frequencies above half the Nyquist limit in an unshifted size x size spectrum"""
+    frequencies = np.abs(np.fft.fftfreq(size))
+    return np.hypot(frequencies[:, None], frequencies[None, :]) > 0.25
+
+
+def texture_scores(gray_crop):
+    """(Laplacian variance, high-frequency energy ratio) of a square grayscale crop"""
+    laplacian = cv2.Laplacian(gray_crop, cv2.CV_32F).var()
+    spectrum = np.abs(np.fft.fft2(gray_crop.astype(np.float32))) ** 2
+    spectrum[0, 0] = 0.0  # Ignore the DC term (overall brightness)
+    total = spectrum.sum()
+    high = spectrum[_high_frequency_mask(gray_crop.shape[0])].sum()
+    return float(laplacian), float(high / total) if total else 0.0
+
+
+def eye_aspect_ratio(eye):
+    """Eye aspect ratio of the six dlib eye landmarks"""
+    p = np.asarray(eye, dtype=np.float64)
+    vertical = np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])
+    horizontal = np.linalg.norm(p[0] - p[3])
+    return vertical / (2.0 * horizontal) if horizontal else 0.0
+
+
+def nonrigid_motion(shapes):
+    """RMS landmark residual left after the best homography onto the first frame
+
+    A flat photo moved, turned or tilted out of plane in front of the camera
+    maps its landmarks by a homography (perspective projection of a plane),
+    so fitting one leaves almost nothing. A live face is not flat and moves
+    its eyes and mouth, which no homography explains.
+    """
+    if len(shapes) < 2:
+        return 0.0
+    normalized = []
+    for shape in shapes:
+        # Centred at unit size, which keeps the least-squares fit well conditioned
+        centered = shape - shape.mean(axis=0)
+        normalized.append(centered / (np.linalg.norm(centered) or 1.0))
+    reference = normalized[0]
+    residuals = []
+    for shape in normalized[1:]:
+        # Least squares over all points (method 0), no outlier rejection
+        homography, _ = cv2.findHomography(shape, reference, 0)
+        if homography is None:
+            residuals.append(0.0)
+            continue
+        projected = cv2.perspectiveTransform(shape[None], homography)[0]
+        residuals.append(np.linalg.norm(projected - reference))
+    return float(np.sqrt(np.mean(np.square(residuals))))
+
+
+class Track:
+    """Evidence collected for one student on one camera"""
+
+    __slots__ = ("started", "last_seen", "texture_pass", "texture_fail", "eye_closed", "blink", "shapes",
+                 "rejected_until")
+
+    def __init__(self, now):
+        self.started = now
+        self.last_seen = now
+        self.texture_pass = 0
+        self.texture_fail = 0
+        self.eye_closed = False
+        self.blink = False
+        self.shapes = []
+        self.rejected_until = 0.0
+
+
+class LivenessChecker:
+    """Per-camera, per-student liveness decisions within a latency budget"""
+
+    def __init__(self, mode=None, budget_ms=None, window=None, landmarks=None):
+        self.mode = settings.LIVENESS_MODE if mode is None else mode
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown liveness mode '{self.mode}', use one of: {', '.join(MODES)}")
+        self.budget = (settings.LIVENESS_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+        self.window = settings.LIVENESS_WINDOW if window is None else window
+        self.tracks = {}
+        self._crop = np.empty((CROP_SIZE, CROP_SIZE), dtype=np.uint8)
+        self._landmarks = landmarks
+        if self.mode == "full" and landmarks is None:
+            try:
+                import face_recognition
+                self._landmarks = face_recognition.face_landmarks
+            except ImportError:
+                print("face_recognition is not available, liveness falls back to the texture check")
+                self.mode = "texture"
+
+    def _texture_passes(self, frame, box):
+        top, right, bottom, left = box
+        crop = frame[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)]
+        if crop.size == 0:
+            return None
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        cv2.resize(crop, (CROP_SIZE, CROP_SIZE), dst=self._crop, interpolation=cv2.INTER_AREA)
+        laplacian, high_frequency = texture_scores(self._crop)
+        return (laplacian >= settings.LIVENESS_LAPLACIAN_MIN
+                and settings.LIVENESS_HF_MIN <= high_frequency <= settings.LIVENESS_HF_MAX)
+
+    def _update_temporal(self, track, rgb, small_box):
+        found = self._landmarks(rgb, [small_box])
+        if not found:
+            return
+        points = found[0]
+        if "left_eye" in points and "right_eye" in points:
+            ratio = (eye_aspect_ratio(points["left_eye"]) + eye_aspect_ratio(points["right_eye"])) / 2
+            if ratio < EYE_CLOSED:
+                track.eye_closed = True
+            elif ratio > EYE_OPEN and track.eye_closed:
+                track.blink = True
+        shape = np.array([p for feature in points.values() for p in feature], dtype=np.float64)
+        if not track.shapes or len(shape) == len(track.shapes[0]):
+            track.shapes.append(shape)
+            del track.shapes[:-settings.LIVENESS_MOTION_FRAMES]
+
+    def check(self, key, frame, box, rgb=None, small_box=None, now=None):
+        """Verdict for a recognized face
+
+        key       - any hashable id of the track, e.g. (camera, student)
+        frame/box - BGR frame and (top, right, bottom, left) for the texture check
+        rgb/small_box - downscaled RGB frame and box for the landmarks
+        """
+        if self.mode == "off":
+            return LIVE
+        start = time.perf_counter()
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        track = self.tracks.get(key)
+        if track is not None and track.rejected_until > now:
+            track.last_seen = now
+            return SPOOF
+        if track is None or track.rejected_until:
+            # New face, or a rejected one whose cooldown is over
+            track = self.tracks[key] = Track(now)
+        track.last_seen = now
+
+        with metrics.timer("liveness"):
+            passed = self._texture_passes(frame, box)
+            if passed is not None:
+                if passed:
+                    track.texture_pass += 1
+                else:
+                    track.texture_fail += 1
+            if (self.mode == "full" and passed and rgb is not None and small_box is not None
+                    and time.perf_counter() - start < self.budget):
+                self._update_temporal(track, rgb, small_box)
+            verdict = self._decide(track, now)
+
+        if verdict == LIVE:
+            del self.tracks[key]
+        elif verdict == SPOOF:
+            # Ignore this face for a while, then give it a fresh chance
+            track.rejected_until = now + self.window
+        metrics.inc(f"liveness_{verdict}")
+        return verdict
+
+    def _decide(self, track, now):
+        votes = track.texture_pass + track.texture_fail
+        if votes >= MIN_TEXTURE_VOTES and track.texture_fail > track.texture_pass:
+            return SPOOF
+        if track.texture_pass >= MIN_TEXTURE_VOTES:
+            if self.mode == "texture":
+                return LIVE
+            if track.blink or nonrigid_motion(track.shapes) >= settings.LIVENESS_MOTION_MIN:
+                return LIVE
+        if now - track.started > self.window:
+            return SPOOF
+        return PENDING
+
+    def _expire(self, now):
+        stale = [key for key, track in self.tracks.items()
+                 if now - track.last_seen > self.window and track.rejected_until <= now]
+        for key in stale:
+            del self.tracks[key]
@@ -0,0 +1,228 @@
+"""Lightweight hot-path instrumentation.
+
+Counters and latency histograms for every stage of the attendance
+pipeline, exposed as a Prometheus /metrics endpoint and as a periodic JSON
+log. When metrics are disabled (the default) timer() hands back a shared
+no-op context manager and inc() returns straight away, so the calls can
+stay in the hot loop.
+
+Usage:
+    with metrics.timer("detection"):
+        locations = detector.detect(image)
+    metrics.inc("faces_detected", len(locations))
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+
+PREFIX = "attendance"
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+ENABLED = settings.METRICS_ENABLED
+_NULL_TIMER = nullcontext()
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_started = False
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        with _lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """Estimate a quantile (in seconds) from the buckets"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+        return BUCKETS[-1]
+
+
+class _Timer:
+    """Context manager recording the elapsed time into a histogram"""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+# ---------- Recording ----------
+def enable(enabled=True):
+    """Turn recording on or off at runtime"""
+    global ENABLED
+    ENABLED = enabled
+
+
+def timer(stage):
+    """Time a block of code as the given pipeline stage"""
+    if not ENABLED:
+        return _NULL_TIMER
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms.setdefault(stage, Histogram())
+    return _Timer(histogram)
+
+
+def observe(stage, seconds):
+    """Record an already measured duration for a stage"""
+    if not ENABLED:
+        return
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms.setdefault(stage, Histogram())
+    histogram.observe(seconds)
+
+
+def inc(name, value=1):
+    """Increase a counter"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    """Forget all recorded values"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# ---------- Exporting ----------
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+def prometheus_text():
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {stage: (list(h.bucket_counts), h.count, h.sum) for stage, h in _histograms.items()}
+
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        lines.append(f"{PREFIX}_{name}_total {value}")
+
+    name = f"{PREFIX}_stage_duration_seconds"
+    lines.append(f"# HELP {name} Time spent in each attendance pipeline stage")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, (bucket_counts, count, total) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{_format_bound(bound)}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """All metrics as a JSON friendly dictionary"""
+    with _lock:
+        counters = dict(_counters)
+    stages = {}
+    for stage, histogram in list(_histograms.items()):
+        count = histogram.count
+        stages[stage] = {
+            "count": count,
+            "mean_ms": histogram.sum / count * 1000 if count else 0.0,
+            "p50_ms": histogram.quantile(0.5) * 1000,
+            "p95_ms": histogram.quantile(0.95) * 1000,
+            "p99_ms": histogram.quantile(0.99) * 1000,
+        }
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "counters": counters, "stages": stages}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the console
+
+
+def serve(host=None, port=None):
+    """Start the /metrics HTTP endpoint in a background thread"""
+    server = ThreadingHTTPServer((host or settings.METRICS_HOST, port or settings.METRICS_PORT), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _log_loop(path, interval):
+    previous_frames = 0
+    while True:
+        time.sleep(interval)
+        data = snapshot()
+        frames = data["counters"].get("frames", 0)
+        data["fps"] = (frames - previous_frames) / interval
+        previous_frames = frames
+        with open(path, "a") as f:
+            f.write(json.dumps(data) + "\n")
+
+
+def start_json_log(path=None, interval=None):
+    """Append a metrics snapshot to a JSON lines file every `interval` seconds"""
+    path = path or settings.METRICS_LOG_PATH
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    threading.Thread(target=_log_loop, args=(path, interval or settings.METRICS_LOG_INTERVAL),
+                     name="metrics-log", daemon=True).start()
+
+
+def start():
+    """Start the endpoint and the JSON log if metrics are enabled (safe to call more than once)"""
+    global _started
+    if not ENABLED or _started:
+        return
+    _started = True
+    try:
+        serve()
+    except OSError as e:
+        print(f"Metrics endpoint not started: {e}")
+    if settings.METRICS_LOG_INTERVAL > 0:
+        start_json_log()
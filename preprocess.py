@@ -0,0 +1,100 @@
+"""Frame preprocessing fast path for the attendance loop.
+
+Each camera gets a FramePreprocessor that owns preallocated buffers for the
+captured frame, the downscaled frame and its colour conversions, and
+refills them in place every iteration (`dst=` in OpenCV) instead of
+allocating new arrays. The detector input is one of those buffers, with no
+extra copy:
+
+    bgr  backends (yunet, ssd) - the downscaled frame itself
+    gray backends (haar, lbp)  - a single-channel conversion of it
+    rgb  backends (hog)        - the RGB conversion, shared with the encoder
+
+The RGB conversion needed by face_recognition is otherwise only made when
+faces were found. Buffers are overwritten by the next process() call, so
+finish with (or copy) a frame's outputs before processing the next one.
+"""
+import cv2
+import numpy as np
+
+import settings
+
+
+def configure_capture(cap, width=None, height=None):
+    """Ask the camera for a reduced capture size where supported, return the size it gives"""
+    width = settings.CAPTURE_WIDTH if width is None else width
+    height = settings.CAPTURE_HEIGHT if height is None else height
+    if width:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    if height:
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+
+class FramePreprocessor:
+    """Downscale and colour-convert one camera's frames into reused buffers"""
+
+    def __init__(self, color="rgb", scale=None, display_scale=None):
+        self.color = color
+        self.scale = settings.PROCESS_SCALE if scale is None else scale
+        self.display_scale = settings.DISPLAY_SCALE if display_scale is None else display_scale
+        self.frame = None
+        self.shape = None
+        self.small = None
+        self.gray = None
+        self._rgb = None
+        self._rgb_ready = False
+        self._display = None
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        self.small_size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        self.small = np.empty((self.small_size[1], self.small_size[0], 3), dtype=np.uint8)
+        self._rgb = np.empty_like(self.small)
+        self.gray = np.empty(self.small.shape[:2], dtype=np.uint8) if self.color == "gray" else None
+        self.display_size = (max(1, round(width * self.display_scale)), max(1, round(height * self.display_scale)))
+        self._display = (np.empty((self.display_size[1], self.display_size[0], 3), dtype=np.uint8)
+                         if self.display_scale != 1 else None)
+        self.shape = shape
+
+    def read(self, cap):
+        """cap.read() into the reused capture buffer"""
+        ret, frame = cap.read(self.frame)
+        if ret:
+            self.frame = frame
+        return ret, frame
+
+    def process(self, frame):
+        """Downscale a BGR frame and return the detector input for it"""
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+        cv2.resize(frame, self.small_size, dst=self.small)
+        self._rgb_ready = False
+        if self.color == "rgb":
+            return self.rgb()
+        if self.color == "gray":
+            cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+            return self.gray
+        return self.small
+
+    def rgb(self):
+        """RGB version of the last downscaled frame, converted at most once per frame"""
+        if not self._rgb_ready:
+            cv2.cvtColor(self.small, cv2.COLOR_BGR2RGB, dst=self._rgb)
+            self._rgb_ready = True
+        return self._rgb
+
+    def display(self, frame):
+        """Frame to draw on and show, downscaled into a reused buffer when DISPLAY_SCALE < 1"""
+        if self._display is None:
+            return frame
+        return cv2.resize(frame, self.display_size, dst=self._display)
+
+    def to_frame(self, box):
+        """Map a (top, right, bottom, left) box from the downscaled frame to the captured frame"""
+        return tuple(int(value / self.scale) for value in box)
+
+    def to_display(self, box):
+        """Map a (top, right, bottom, left) box from the downscaled frame to the display frame"""
+        factor = self.display_scale / self.scale
+        return tuple(int(value * factor) for value in box)
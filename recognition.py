@@ -0,0 +1,376 @@
+"""Face encoding storage and matching.
+
+Kept free of any GUI code so the matcher can be reused by the benchmarks
+and by other front ends.
+
+Matchers:
+    FaceMatcher      - exact float64 nearest neighbour (the default)
+    QuantizedMatcher - float16 or int8 storage for low-memory kiosks,
+                       approximate scan plus a top-k re-check against the
+                       float64 encodings, kept memory-mapped off the heap
+    MatchCache       - LSH-keyed cache in front of either one
+"""
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+import settings
+
+# Length of a face_recognition encoding
+ENCODING_SIZE = 128
+
+
+def load_encodings(path=None):
+    """Load the {"<id>_<name>": encoding} dictionary written by encode_faces()"""
+    with open(path or settings.ENCODINGS_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+def save_encodings(encodings, path=None):
+    """Write the encodings dictionary"""
+    with open(path or settings.ENCODINGS_PATH, "wb") as f:
+        pickle.dump(encodings, f)
+
+
+def _encoding_matrix(encodings_dict):
+    """float64 (students x dimensions) matrix of the encodings, (0, ENCODING_SIZE) when empty"""
+    if not encodings_dict:
+        return np.empty((0, ENCODING_SIZE))
+    return np.array(list(encodings_dict.values()), dtype=np.float64).reshape(len(encodings_dict), -1)
+
+
+def _off_heap(matrix):
+    """Copy of a matrix in an unlinked temporary file, memory-mapped instead of held on the heap"""
+    if not matrix.size:
+        return matrix
+    mapped = np.memmap(tempfile.TemporaryFile(), dtype=matrix.dtype, mode="w+", shape=matrix.shape)
+    mapped[:] = matrix
+    mapped.flush()
+    return mapped
+
+
+def split_student_key(key):
+    """Split an encodings key "<id>_<name>" into (student_id, name)"""
+    student_id, _, name = key.partition("_")
+    return student_id, name or key
+
+
+class FaceMatcher:
+    """Nearest neighbour matcher over all known face encodings"""
+
+    def __init__(self, encodings_dict, tolerance=None):
+        self.names = list(encodings_dict.keys())
+        self.student_ids = [split_student_key(name)[0] for name in self.names]
+        self.matrix = _encoding_matrix(encodings_dict)
+        self.tolerance = settings.TOLERANCE if tolerance is None else tolerance
+        self._squared_norms = None
+
+    @classmethod
+    def from_index(cls, names, arrays, tolerance=None):
+        """Matcher over prebuilt index arrays (e.g. memory-mapped by snapshot.py), nothing is copied"""
+        matcher = cls.__new__(cls)
+        matcher.names = list(names)
+        matcher.student_ids = [split_student_key(name)[0] for name in matcher.names]
+        matcher.matrix = arrays["matrix"]
+        matcher.tolerance = settings.TOLERANCE if tolerance is None else tolerance
+        matcher._squared_norms = None
+        return matcher
+
+    def index_arrays(self):
+        """Arrays from_index() needs to rebuild this matcher"""
+        return {"matrix": self.matrix}
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def dimensions(self):
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self):
+        """Memory held by the known encodings"""
+        return self.matrix.nbytes
+
+    def encoding(self, index):
+        return self.matrix[index]
+
+    def mean_encoding(self):
+        return self.matrix.mean(axis=0)
+
+    def distance(self, index, face_encoding):
+        """Distance from an encoding to one known student"""
+        return float(np.linalg.norm(self.matrix[index] - face_encoding))
+
+    def distances(self, face_encoding):
+        """Euclidean distance to every known encoding (same as face_recognition.face_distance)"""
+        return np.linalg.norm(self.matrix - face_encoding, axis=1)
+
+    def match(self, face_encoding):
+        """Return (index, distance) of the best match, index is None when nobody is within tolerance"""
+        if not self.names:
+            return None, float("inf")
+        face_distances = self.distances(face_encoding)
+        best_match_index = int(np.argmin(face_distances))
+        best_distance = float(face_distances[best_match_index])
+        if best_distance < self.tolerance:
+            return best_match_index, best_distance
+        return None, best_distance
+
+    def match_batch(self, face_encodings):
+        """Match many encodings at once, returns a list of (index, distance)"""
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, self.matrix.shape[1])
+        if not self.names or not len(queries):
+            return [(None, float("inf"))] * len(queries)
+        # |q - k|^2 = |q|^2 + |k|^2 - 2 q.k for the whole batch in one matrix product
+        if self._squared_norms is None:
+            self._squared_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        squared = (np.einsum("ij,ij->i", queries, queries)[:, None] + self._squared_norms[None, :]
+                   - 2.0 * queries @ self.matrix.T)
+        best = np.argmin(squared, axis=1)
+        distances = np.sqrt(np.maximum(squared[np.arange(len(queries)), best], 0.0))
+        return [(int(index), float(distance)) if distance < self.tolerance else (None, float(distance))
+                for index, distance in zip(best, distances)]
+
+
+class QuantizedMatcher:
+    """Nearest neighbour matcher over float16 or int8 scalar-quantized encodings
+
+    Only the quantized matrix is kept on the heap: 256 (float16) or 128
+    (int8) bytes per student instead of 1024. int8 uses one symmetric scale
+    per dimension (max |value| / 127). Candidates are ranked with the
+    |q|^2 + |k|^2 - 2 q.k expansion directly on the quantized codes,
+    converted to float32 a block of rows at a time, and only the `top_k`
+    nearest are re-checked with an exact distance to their original float64
+    encodings. Those stay memory-mapped (`exact`, a temporary file or the
+    snapshot's .npy), so only the pages of the re-checked rows are read.
+    """
+
+    BLOCK_ROWS = 4096
+
+    def __init__(self, encodings_dict, tolerance=None, storage="int8", top_k=None):
+        self.names = list(encodings_dict.keys())
+        self.student_ids = [split_student_key(name)[0] for name in self.names]
+        self.tolerance = settings.TOLERANCE if tolerance is None else tolerance
+        self.top_k = settings.MATCH_TOP_K if top_k is None else top_k
+        self.storage = storage
+
+        matrix = _encoding_matrix(encodings_dict)
+        if storage == "float16":
+            self.codes = matrix.astype(np.float16)
+            self.scales = None
+        elif storage == "int8":
+            max_abs = np.abs(matrix).max(axis=0) if len(matrix) else np.ones(matrix.shape[1])
+            self.scales = np.where(max_abs > 0, max_abs / 127.0, 1.0)
+            self.codes = np.clip(np.rint(matrix / self.scales), -127, 127).astype(np.int8)
+        else:
+            raise ValueError(f"Unknown encoding storage '{storage}', use float16 or int8")
+        self.exact = _off_heap(matrix)
+        del matrix
+
+        self._squared_norms = np.empty(len(self.names), dtype=np.float32)
+        for start in range(0, len(self.names), self.BLOCK_ROWS):
+            block = self._dequantize(slice(start, start + self.BLOCK_ROWS)).astype(np.float32)
+            self._squared_norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+
+    @classmethod
+    def from_index(cls, names, arrays, tolerance=None, top_k=None):
+        """Matcher over prebuilt index arrays (e.g. memory-mapped by snapshot.py), nothing is copied"""
+        matcher = cls.__new__(cls)
+        matcher.names = list(names)
+        matcher.student_ids = [split_student_key(name)[0] for name in matcher.names]
+        matcher.tolerance = settings.TOLERANCE if tolerance is None else tolerance
+        matcher.top_k = settings.MATCH_TOP_K if top_k is None else top_k
+        matcher.codes = arrays["codes"]
+        matcher.storage = "int8" if matcher.codes.dtype == np.int8 else "float16"
+        matcher.scales = arrays.get("scales")
+        matcher._squared_norms = arrays["squared_norms"]
+        matcher.exact = arrays["exact"]
+        return matcher
+
+    def index_arrays(self):
+        """Arrays from_index() needs to rebuild this matcher"""
+        arrays = {"codes": self.codes, "squared_norms": self._squared_norms, "exact": self.exact}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        return arrays
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def dimensions(self):
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self):
+        """Heap memory held by the known encodings (the memory-mapped exact encodings are not counted)"""
+        return self.codes.nbytes + self._squared_norms.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _dequantize(self, rows):
+        codes = self.codes[rows].astype(np.float64)
+        return codes * self.scales if self.scales is not None else codes
+
+    def encoding(self, index):
+        return np.asarray(self.exact[index])
+
+    def mean_encoding(self):
+        return self.codes.mean(axis=0, dtype=np.float64) * (self.scales if self.scales is not None else 1.0)
+
+    def distance(self, index, face_encoding):
+        """Distance from an encoding to one known student"""
+        return float(np.linalg.norm(self.exact[index] - face_encoding))
+
+    def _approximate_squared(self, queries):
+        """Approximate squared distances (queries x students) computed on the quantized codes"""
+        queries = queries.astype(np.float32)
+        # (q * scale) . codes == q . (codes * scale), so the codes are never rescaled
+        scaled = queries * self.scales.astype(np.float32) if self.scales is not None else queries
+        squared = np.empty((len(queries), len(self.names)), dtype=np.float32)
+        for start in range(0, len(self.names), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS].astype(np.float32)
+            squared[:, start:start + len(block)] = self._squared_norms[start:start + len(block)] - 2.0 * scaled @ block.T
+        squared += np.einsum("ij,ij->i", queries, queries)[:, None]
+        return squared
+
+    def distances(self, face_encoding):
+        """Approximate distance to every known encoding"""
+        squared = self._approximate_squared(np.asarray(face_encoding, dtype=np.float64).reshape(1, -1))[0]
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def match(self, face_encoding):
+        """Return (index, distance) of the best match, index is None when nobody is within tolerance"""
+        return self.match_batch([face_encoding])[0]
+
+    def match_batch(self, face_encodings):
+        """Match many encodings at once, returns a list of (index, distance)"""
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, self.dimensions)
+        if not self.names or not len(queries):
+            return [(None, float("inf"))] * len(queries)
+        squared = self._approximate_squared(queries)
+        k = min(max(self.top_k, 1), len(self.names))
+        if k < len(self.names):
+            candidates = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self.names)), squared.shape)
+
+        results = []
+        for query, rows in zip(queries, candidates):
+            # Exact re-check of the few nearest candidates against the original encodings
+            exact = np.linalg.norm(self.exact[rows] - query, axis=1)
+            best = int(np.argmin(exact))
+            index, distance = int(rows[best]), float(exact[best])
+            results.append((index, distance) if distance < self.tolerance else (None, distance))
+        return results
+
+
+class MatchCache:
+    """LRU/TTL cache in front of a FaceMatcher for near-duplicate encodings
+
+    Consecutive frames of the same face give almost identical encodings.
+    Queries are hashed with random-hyperplane LSH (sign bits of the centred
+    encoding) so near duplicates share a bucket. A cached identity is only
+    reused when the query is confidently inside the tolerance
+    (distance < tolerance - margin) of that student's encoding; anything
+    else falls back to the full match.
+    """
+
+    def __init__(self, matcher, size=None, ttl=None, bits=None, margin=None, seed=0):
+        self.matcher = matcher
+        self.names = matcher.names
+        self.student_ids = matcher.student_ids
+        self.size = settings.MATCH_CACHE_SIZE if size is None else size
+        self.ttl = settings.MATCH_CACHE_TTL if ttl is None else ttl
+        self.margin = settings.MATCH_CACHE_MARGIN if margin is None else margin
+        bits = settings.MATCH_CACHE_BITS if bits is None else bits
+
+        dimensions = matcher.dimensions
+        self.center = matcher.mean_encoding() if len(matcher) else np.zeros(dimensions)
+        self.planes = np.random.default_rng(seed).standard_normal((dimensions, bits))
+        self.weights = 1 << np.arange(bits, dtype=np.int64)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def key(self, face_encoding):
+        """LSH bucket of an encoding"""
+        bits = (face_encoding - self.center) @ self.planes > 0
+        return int(bits @ self.weights)
+
+    def match(self, face_encoding):
+        """Same result as FaceMatcher.match, served from the cache when safe"""
+        key = self.key(face_encoding)
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None:
+            index, expires = entry
+            if expires < now:
+                del self.entries[key]
+            else:
+                distance = self.matcher.distance(index, face_encoding)
+                if distance < self.matcher.tolerance - self.margin:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("match_cache_hits")
+                    return index, distance
+                self.fallbacks += 1
+                metrics.inc("match_cache_fallbacks")
+
+        self.misses += 1
+        metrics.inc("match_cache_misses")
+        index, distance = self.matcher.match(face_encoding)
+        if index is not None and distance < self.matcher.tolerance - self.margin:
+            self.entries[key] = (index, now + self.ttl)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return index, distance
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Hit rate and counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _with_cache(matcher, cache):
+    if cache and settings.MATCH_CACHE_SIZE > 0:
+        return MatchCache(matcher)
+    return matcher
+
+
+def create_matcher(encodings_dict, tolerance=None, cache=True):
+    """Matcher for the configured storage, wrapped in a MatchCache unless the cache is disabled"""
+    if settings.MATCH_STORAGE == "float64":
+        matcher = FaceMatcher(encodings_dict, tolerance)
+    else:
+        matcher = QuantizedMatcher(encodings_dict, tolerance, settings.MATCH_STORAGE)
+    return _with_cache(matcher, cache)
+
+
+def matcher_from_index(names, arrays, tolerance=None, cache=True):
+    """Same as create_matcher() over the index_arrays() of a matcher built earlier"""
+    if "matrix" in arrays:
+        matcher = FaceMatcher.from_index(names, arrays, tolerance)
+    else:
+        matcher = QuantizedMatcher.from_index(names, arrays, tolerance)
+    return _with_cache(matcher, cache)
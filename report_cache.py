@@ -0,0 +1,160 @@
+"""Cached report results, invalidated by the database write counters.
+
+Operators open the same reports many times a day while most of the data
+has not changed. Results are cached in a bounded LRU keyed by the query
+parameters and the data versions they were computed from (see
+attendance_db.data_versions, bumped by triggers on every write):
+
+    attendance frames - one entry per partition, so a new mark only re-reads
+                        the current month; archived months only change when
+                        late rows are merged into them
+    combined results  - the attendance frame, statistics text (without the
+                        "Generated on" header, added when it is shown) and
+                        Excel workbook for a (start, end) range
+
+A repeated request with no writes in between is a dictionary lookup. Hits
+and misses count the public requests only, not the partition lookups made
+while computing one, and are exported as metrics counters.
+"""
+import io
+from collections import OrderedDict
+
+import attendance_db
+import metrics
+import reports
+import settings
+
+_MISSING = object()
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ReportCache:
+    """Bounded LRU of report results keyed by parameters and data versions"""
+
+    def __init__(self, max_mb=None):
+        self.max_bytes = int((settings.REPORT_CACHE_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key, count=True):
+        entry = self.entries.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+                metrics.inc("report_cache_misses")
+            return _MISSING
+        self.entries.move_to_end(key)
+        if count:
+            self.hits += 1
+            metrics.inc("report_cache_hits")
+        return entry[0]
+
+    def _put(self, key, value, size):
+        if not self.max_bytes or size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def _cached(self, key, compute, size, count=True):
+        value = self._get(key, count)
+        if value is _MISSING:
+            value = compute()
+            self._put(key, value, size(value))
+        return value
+
+    def _attendance_key(self, conn, start, end):
+        """Cache keys for the range: one per partition plus the combined key"""
+        versions = attendance_db.data_versions(conn)
+        students = versions.get("students", 0)
+        sources = []
+        for table, archived in attendance_db.attendance_sources(conn, start, end):
+            # Archives hold their own names and only change when late rows are merged in
+            version = attendance_db.archive_version(conn, table) if archived else (versions.get(table, 0), students)
+            sources.append((table, archived, version))
+        return ("attendance", start, end, tuple(sources)), sources
+
+    def attendance(self, conn, start=None, end=None):
+        """Same result as attendance_db.fetch_attendance, recomputing only changed partitions
+
+        The returned frame is shared with the cache and must not be modified.
+        """
+        return self._attendance(conn, start, end)
+
+    def _attendance(self, conn, start, end, count=True):
+        key, sources = self._attendance_key(conn, start, end)
+        df = self._get(key, count)
+        if df is not _MISSING:
+            return df
+
+        frames = [self._cached(("partition", table, archived, version, start, end),
+                               lambda: attendance_db.fetch_partition(conn, table, archived, start, end),
+                               _frame_bytes, count=False)
+                  for table, archived, version in sources]
+        df = attendance_db.combine_attendance(frames, attendance_db.has_overlapping_sources(
+            [(table, archived) for table, archived, _ in sources]))
+        # A single partition is returned as is, don't count its memory twice
+        self._put(key, df, 0 if any(df is f for f in frames) else _frame_bytes(df))
+        return df
+
+    def students(self, conn):
+        """Same result as attendance_db.fetch_students"""
+        return self._students(conn)
+
+    def _students(self, conn, count=True):
+        version = attendance_db.data_versions(conn).get("students", 0)
+        return self._cached(("students", version), lambda: attendance_db.fetch_students(conn), _frame_bytes, count)
+
+    def statistics(self, conn, start=None, end=None):
+        """Statistics report text, or None when there is no attendance in the range"""
+        key, _ = self._attendance_key(conn, start, end)
+
+        def build():
+            df = self._attendance(conn, start, end, count=False)
+            return None if df.empty else reports.statistics_body(df)
+        body = self._cached(("statistics",) + key, build, lambda text: len(text or ""))
+        # The header carries the time the report is shown, so it is never cached
+        return None if body is None else reports.statistics_header() + body
+
+    def export(self, conn, filename, start=None, end=None, with_students=True):
+        """Write the Excel export to filename, reusing the workbook while nothing changed"""
+        key, _ = self._attendance_key(conn, start, end)
+        version = attendance_db.data_versions(conn).get("students", 0) if with_students else None
+
+        def build():
+            buffer = io.BytesIO()
+            reports.export_to_excel(buffer, self._attendance(conn, start, end, count=False),
+                                    self._students(conn, count=False) if with_students else None)
+            return buffer.getvalue()
+        workbook = self._cached(("export", version) + key, build, len)
+        with open(filename, "wb") as f:
+            f.write(workbook)
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+cache = ReportCache()
@@ -0,0 +1,74 @@
+"""Report generation shared by both apps (no GUI code)."""
+from datetime import datetime
+
+import pandas as pd
+
+
+def build_statistics_report(df):
+    """Build the attendance statistics report text from the attendance records"""
+    return statistics_header() + statistics_body(df)
+
+
+def statistics_header(generated=None):
+    """Title and "Generated on" line of the statistics report"""
+    generated = generated or datetime.now()
+    return f"""
+ATTENDANCE STATISTICS REPORT
+Generated on: {generated.strftime('%Y-%m-%d %H:%M:%S')}
+"""
+
+
+def statistics_body(df):
+    """Statistics report text after the header, depends only on the attendance records"""
+    df = df.copy()
+    # Convert date column to datetime
+    df['date'] = pd.to_datetime(df['date'])
+
+    # Calculate statistics
+    total_records = len(df)
+    unique_students = df['student_id'].nunique()
+    date_range = f"{df['date'].min().date()} to {df['date'].max().date()}"
+
+    # Daily attendance count
+    daily_stats = df.groupby('date').size().describe()
+
+    # Student attendance frequency
+    student_stats = df.groupby(['student_id', 'name']).size().sort_values(ascending=False)
+
+    # Generate report text
+    report = f"""
+OVERVIEW:
+Total attendance records: {total_records}
+Unique students: {unique_students}
+Date range: {date_range}
+
+DAILY ATTENDANCE STATISTICS:
+Average daily attendance: {daily_stats['mean']:.2f}
+Maximum daily attendance: {daily_stats['max']:.0f}
+Minimum daily attendance: {daily_stats['min']:.0f}
+
+STUDENT ATTENDANCE FREQUENCY:
+"""
+
+    for (student_id, name), count in student_stats.head(10).items():
+        report += f"{name} ({student_id}): {count} days\n"
+
+    return report
+
+
+def export_filename():
+    """Timestamped file name for an Excel export"""
+    return f"attendance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+
+def export_to_excel(filename, attendance_df, students_df=None):
+    """Write attendance (and optionally students) to an Excel workbook"""
+    if students_df is None:
+        attendance_df.to_excel(filename, index=False)
+        return
+
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        if not attendance_df.empty:
+            attendance_df.to_excel(writer, sheet_name='Attendance Records', index=False)
+        if not students_df.empty:
+            students_df.to_excel(writer, sheet_name='Registered Students', index=False)
@@ -0,0 +1,186 @@
+"""In-memory roster and queued attendance writer for fast ID entry.
+
+The quick entry window has to keep up with a barcode scanner (several IDs
+per second), so nothing on the keypress path touches SQLite:
+
+    Roster           - student_id -> (key, name) dict for O(1) lookups plus
+                       a sorted ID list searched with bisect for prefix
+                       autocomplete; loaded once and updated on registration
+    AttendanceWriter - today's present set for the duplicate check and a
+                       background thread that writes queued rows in batches
+                       with attendance_db.mark_present_many
+"""
+import queue
+import threading
+import time
+from bisect import bisect_left, insort
+
+import attendance_db
+import dashboard
+import metrics
+import settings
+
+
+class Roster:
+    """Registered students indexed by student ID"""
+
+    def __init__(self, students=()):
+        self._by_id = {}
+        for student_id, key, name in students:
+            self._by_id[student_id] = (key, name)
+        self._ids = sorted(self._by_id)
+
+    @classmethod
+    def load(cls, conn):
+        return cls(conn.execute("SELECT student_id, id, name FROM students"))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, student_id):
+        return student_id in self._by_id
+
+    def get(self, student_id):
+        """Return (key, name) for a registered student ID, or None"""
+        return self._by_id.get(student_id)
+
+    def add(self, student_id, key, name):
+        """Keep the index in sync after a student is registered"""
+        if student_id not in self._by_id:
+            insort(self._ids, student_id)
+        self._by_id[student_id] = (key, name)
+
+    def rows(self):
+        """(student_id, key, name) for every student in ID order, the input of Roster()"""
+        return [(student_id,) + self._by_id[student_id] for student_id in self._ids]
+
+    def complete(self, prefix, limit=8):
+        """Up to `limit` (student_id, name) pairs whose ID starts with prefix, in ID order"""
+        start = bisect_left(self._ids, prefix)
+        matches = []
+        for student_id in self._ids[start:start + limit]:
+            if not student_id.startswith(prefix):
+                break
+            matches.append((student_id, self._by_id[student_id][1]))
+        return matches
+
+
+class AttendanceWriter:
+    """Mark students present immediately in memory and write to SQLite in the background
+
+    `mark()` checks today's present set and queues the row, so callers can
+    acknowledge at once. A student missing from the set is confirmed against
+    the database first, since the camera loop or the ingest service may have
+    marked them since the set was loaded. The writer thread owns its own
+    connection and commits whatever has queued up every `interval_ms`. A
+    failed write (e.g. the database is locked) keeps its rows and is retried
+    with a growing delay; `error` holds the last failure until a write
+    succeeds again. Rows that still cannot be written when `close()` gives up
+    are taken out of the present set and returned.
+    """
+
+    def __init__(self, db_path=None, interval_ms=None):
+        self.db_path = db_path or settings.DB_PATH
+        self.interval = (settings.WRITER_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.day = None
+        self.present = set()
+        self.error = None
+        self.retrying = 0
+        self.unwritten = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def _roll_day(self):
+        """Reload today's present set when the date changes"""
+        day = attendance_db.day_number()
+        if day != self.day:
+            conn = attendance_db.connect(self.db_path)
+            self.present = attendance_db.present_students(conn, day)
+            conn.close()
+            self.day = day
+
+    def is_marked(self, student):
+        """Whether the student is marked today, checking the database on a miss"""
+        self._roll_day()
+        if student in self.present:
+            return True
+        # Marked by another process (camera loop, ingest service) since the set was loaded
+        conn = attendance_db.connect(self.db_path)
+        try:
+            marked = attendance_db.is_marked(conn, student, self.day)
+        finally:
+            conn.close()
+        if marked:
+            self.present.add(student)
+        return marked
+
+    def mark(self, student, camera=None):
+        """Queue a Present row for the student (integer key), False if already marked today"""
+        if self.is_marked(student):
+            return False
+        self.present.add(student)
+        self._queue.put((student, self.day, attendance_db.time_seconds()))
+        metrics.inc("attendance_marked")
+        dashboard.publish(dashboard.MARKED, student, camera)
+        return True
+
+    def pending(self):
+        """Rows not written yet, including the ones waiting for a retry"""
+        return self._queue.qsize() + self.retrying
+
+    def close(self):
+        """Write everything still queued and stop the thread, return the rows that could not be written"""
+        self._queue.put(None)
+        self._thread.join()
+        return self.unwritten
+
+    def _give_up(self, rows):
+        """Forget rows that will never be written, so the students can be marked again"""
+        for student, day, _ in rows:
+            if day == self.day:
+                self.present.discard(student)
+        self.unwritten.extend(rows)
+        print(f"Gave up writing {len(rows)} attendance rows: {self.error}")
+
+    def _run(self):
+        conn = attendance_db.connect(self.db_path)
+        rows = []
+        delay = self.interval
+        stopping = False
+        deadline = None
+        while True:
+            if not rows and not stopping:
+                rows.append(self._queue.get())
+            time.sleep(delay)
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in rows:
+                stopping = True
+                deadline = time.monotonic() + settings.WRITER_CLOSE_TIMEOUT
+                rows = [row for row in rows if row is not None]
+            if rows:
+                try:
+                    with metrics.timer("db_insert"):
+                        attendance_db.mark_present_many(conn, rows)
+                except Exception as e:
+                    conn.rollback()
+                    self.error = str(e)
+                    self.retrying = len(rows)
+                    metrics.inc("attendance_write_errors")
+                    # Keep the rows and retry with a growing delay
+                    delay = min(delay * 2, settings.WRITER_MAX_BACKOFF_MS / 1000)
+                    if stopping and time.monotonic() >= deadline:
+                        self._give_up(rows)
+                        rows = []
+                else:
+                    rows = []
+                    self.error = None
+                    self.retrying = 0
+                    delay = self.interval
+            if stopping and not rows:
+                break
+        conn.close()
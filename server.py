@@ -0,0 +1,419 @@
+"""Asyncio attendance ingest service for thin camera clients.
+
+Camera stations no longer need dlib, the encodings file or the database:
+they POST either JPEG frames or precomputed 128-d encodings and one server
+does the matching and writes to the shared database.
+
+Concurrent requests share work: encodings from all clients are queued and
+matched in micro-batches with a single matrix product, frames are detected
+in batches, and new attendance rows are written in batched transactions by
+one writer thread.
+
+Endpoints:
+    POST /encodings  {"camera": "gate-1", "encodings": [[128 floats], ...]}
+    POST /frames     JPEG body, optional "X-Camera" header
+    GET  /health
+    GET  /dashboard  live present/absent counts and arrival rates (see dashboard.py)
+    GET  /metrics    Prometheus text (see metrics.py)
+
+Usage:
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import attendance_db
+import dashboard
+import metrics
+import recognition
+import settings
+
+MAX_BODY = 8 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """Collect concurrent requests and process them together
+
+    The first queued item starts a batch; whatever else arrives within
+    `max_wait` seconds (up to `max_size` items) joins it. The batch function
+    runs in an executor and must return one result per item; an exception
+    instance in place of a result fails only that item's request.
+    """
+
+    def __init__(self, process_batch, executor, max_size=None, max_wait=None):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_size = max_size or settings.SERVER_BATCH_SIZE
+        self.max_wait = settings.SERVER_BATCH_WAIT_MS / 1000 if max_wait is None else max_wait
+        self.queue = None
+        self.task = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            waited = False
+            while len(batch) < self.max_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    if waited or self.max_wait <= 0:
+                        break
+                    await asyncio.sleep(self.max_wait)
+                    waited = True
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            metrics.inc("server_batches")
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class AttendanceService:
+    """Shared matcher, frame pipeline and batched database writer"""
+
+    def __init__(self, encodings_dict, db_path=None):
+        self.matcher = recognition.create_matcher(encodings_dict, cache=False)
+        self.db_path = db_path or settings.DB_PATH
+        self.compute_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="match")
+        # SQLite connections are used from the single writer thread only
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.conn = None
+        self.day = None
+        self.present = set()
+        self.student_keys = []
+        self.live = None
+        self.write_queue = None
+        self.write_task = None
+        # Rows of a failed write, retried before anything newer
+        self.unsaved = []
+        self.write_error = None
+        self.detector = None
+        self.match_batcher = MicroBatcher(self.matcher.match_batch, self.compute_executor)
+        self.frame_batcher = MicroBatcher(self._encode_frames, self.compute_executor)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        attendance_db.init_db(self.db_path)
+        if settings.AUTO_ARCHIVE:
+            attendance_db.archive_old_partitions(self.db_path)
+        self.conn = await loop.run_in_executor(self.db_executor, attendance_db.connect, self.db_path)
+        pairs = [recognition.split_student_key(name) for name in self.matcher.names]
+        self.student_keys = await loop.run_in_executor(self.db_executor, attendance_db.ensure_students,
+                                                       self.conn, pairs)
+        await self._roll_day()
+        self.live = await loop.run_in_executor(self.db_executor, dashboard.LiveStats.from_db, self.conn,
+                                               len(self.student_keys))
+        self.write_queue = asyncio.Queue()
+        self.match_batcher.start()
+        self.frame_batcher.start()
+        self.write_task = loop.create_task(self._write_loop())
+
+    async def close(self):
+        """Stop the writer and save the rows still queued, retrying until ATTENDANCE_WRITER_CLOSE_TIMEOUT"""
+        if self.write_task is None:
+            return
+        self.write_task.cancel()
+        try:
+            await self.write_task
+        except asyncio.CancelledError:
+            pass
+        self._take_queued()
+        deadline = time.monotonic() + settings.WRITER_CLOSE_TIMEOUT
+        while self.unsaved and not await self._write_unsaved() and time.monotonic() < deadline:
+            await asyncio.sleep(settings.WRITER_MAX_BACKOFF_MS / 1000)
+        if self.unsaved:
+            print(f"Gave up writing {len(self.unsaved)} attendance rows: {self.write_error}")
+            today = attendance_db.day_number(self.day)
+            for student, day, _ in self.unsaved:
+                if day == today:
+                    self.present.discard(student)
+
+    async def _roll_day(self):
+        """Reload today's present set when the date changes"""
+        day = attendance_db.today()
+        if day != self.day:
+            loop = asyncio.get_running_loop()
+            self.present = await loop.run_in_executor(self.db_executor, attendance_db.present_students,
+                                                      self.conn, day)
+            self.day = day
+
+    # ---------- Matching ----------
+    async def _is_present(self, student):
+        """Whether the student is marked today, checking the database on a miss"""
+        if student in self.present:
+            return True
+        # Marked by another station or quick entry since the set was loaded
+        loop = asyncio.get_running_loop()
+        marked = await loop.run_in_executor(self.db_executor, attendance_db.is_marked, self.conn, student, self.day)
+        if marked or student in self.present:
+            self.present.add(student)
+            return True
+        return False
+
+    async def recognize(self, encodings, camera):
+        """Match encodings and queue attendance for newly seen students"""
+        await self._roll_day()
+        with metrics.timer("server_matching"):
+            matches = await asyncio.gather(*(self.match_batcher.submit(e) for e in encodings))
+
+        results = []
+        for index, distance in matches:
+            if index is None:
+                metrics.inc("faces_unknown")
+                results.append({"student_id": None, "distance": distance})
+                continue
+            student_id = self.matcher.student_ids[index]
+            name = self.matcher.names[index]
+            student = self.student_keys[index]
+            marked = not await self._is_present(student)
+            if marked:
+                self.present.add(student)
+                self.write_queue.put_nowait((student, attendance_db.day_number(self.day), attendance_db.time_seconds()))
+                metrics.inc("attendance_marked")
+                self.live.add(dashboard.Event(dashboard.MARKED, time.time(), student, camera))
+                print(f"{name} marked present at {datetime.now().time()} ({camera})")
+            metrics.inc("faces_recognized")
+            results.append({"student_id": student_id, "name": name, "distance": distance, "marked": marked})
+        return results
+
+    def _encode_frames(self, jpegs):
+        """Decode, detect and encode a batch of JPEG frames (runs in the executor)"""
+        import cv2
+        import face_recognition
+        from detectors import create_detector
+
+        if self.detector is None:
+            self.detector = create_detector()
+        # A frame that fails only fails its own request, never the rest of the batch
+        results = [None] * len(jpegs)
+        bgr_frames, rgb_frames = {}, {}
+        for i, jpeg in enumerate(jpegs):
+            try:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            except cv2.error:
+                frame = None
+            if frame is None:
+                results[i] = HTTPError(400, "Body is not a valid JPEG image")
+                continue
+            bgr_frames[i] = frame
+            rgb_frames[i] = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        valid = list(bgr_frames)
+        inputs = [self.detector.prepare(bgr_frames[i], rgb_frames[i]) for i in valid]
+        try:
+            batch_locations = self.detector.detect_batch(inputs)
+        except Exception:
+            # Find the frame that broke the batch by detecting one at a time
+            batch_locations = []
+            for i, detector_input in zip(valid, inputs):
+                try:
+                    batch_locations.append(self.detector.detect(detector_input))
+                except Exception as e:
+                    results[i] = HTTPError(500, f"Face detection failed on this frame: {e}")
+                    batch_locations.append(None)
+        for i, locations in zip(valid, batch_locations):
+            if locations is None:
+                continue
+            try:
+                results[i] = (locations, face_recognition.face_encodings(rgb_frames[i], locations))
+            except Exception as e:
+                results[i] = HTTPError(500, f"Face encoding failed on this frame: {e}")
+        return results
+
+    async def recognize_frame(self, jpeg, camera):
+        if not jpeg:
+            raise HTTPError(400, "Body is empty, send a JPEG image")
+        try:
+            result = await self.frame_batcher.submit(jpeg)
+        except (ImportError, FileNotFoundError, ValueError) as e:
+            raise HTTPError(503, f"Frame ingest is not available on this server: {e}")
+        locations, encodings = result
+        results = await self.recognize(encodings, camera) if encodings else []
+        for item, location in zip(results, locations):
+            item["location"] = list(location)
+        return results
+
+    # ---------- Database Writer ----------
+    def _take_queued(self):
+        while not self.write_queue.empty():
+            self.unsaved.append(self.write_queue.get_nowait())
+
+    def _write_rows(self, rows):
+        """Write rows on the db thread, rolling back a failed transaction"""
+        try:
+            attendance_db.mark_present_many(self.conn, rows)
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    async def _write_unsaved(self):
+        """Write the pending rows, keeping them for a retry on failure; True when saved"""
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timer("server_db_insert"):
+                await loop.run_in_executor(self.db_executor, self._write_rows, self.unsaved)
+        except Exception as e:
+            self.write_error = str(e)
+            metrics.inc("attendance_write_errors")
+            print(f"Failed to write {len(self.unsaved)} attendance rows, retrying: {e}")
+            return False
+        self.unsaved = []
+        self.write_error = None
+        return True
+
+    async def _write_loop(self):
+        wait = settings.SERVER_WRITE_INTERVAL_MS / 1000
+        delay = wait
+        while True:
+            if not self.unsaved:
+                self.unsaved.append(await self.write_queue.get())
+            await asyncio.sleep(delay)
+            self._take_queued()
+            # A failed write keeps its rows and is retried with a growing delay
+            delay = wait if await self._write_unsaved() else min(delay * 2, settings.WRITER_MAX_BACKOFF_MS / 1000)
+
+    # ---------- HTTP ----------
+    async def route(self, method, path, headers, body):
+        path = path.split("?")[0]
+        if path == "/health":
+            return 200, {"status": "ok" if self.write_error is None else "degraded", "students": len(self.matcher),
+                         "present_today": len(self.present), "unsaved_rows": len(self.unsaved) + self.write_queue.qsize(),
+                         "write_error": self.write_error}
+        if path == "/dashboard":
+            return 200, self.live.snapshot()
+        if path == "/metrics":
+            return 200, metrics.prometheus_text()
+        if path not in ("/encodings", "/frames"):
+            raise HTTPError(404, f"Unknown path {path}")
+        if method != "POST":
+            raise HTTPError(405, "Use POST")
+
+        if path == "/frames":
+            return 200, {"results": await self.recognize_frame(body, headers.get("x-camera", "unknown"))}
+
+        try:
+            payload = json.loads(body)
+            encodings = np.asarray(payload["encodings"], dtype=np.float64).reshape(-1, self.matcher.dimensions)
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPError(400, f"Invalid encodings payload: {e}")
+        return 200, {"results": await self.recognize(encodings, payload.get("camera", "unknown"))}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if length > MAX_BODY:
+                    status, payload, keep_alive = 413, {"error": "Body too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        with metrics.timer("server_request"):
+                            status, payload = await self.route(method, path, headers, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {"error": str(e)}
+                    except Exception as e:
+                        print(f"Error handling {method} {path}: {e!r}")
+                        metrics.inc("server_errors")
+                        status, payload = 500, {"error": f"Internal error: {e}"}
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                             f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, encodings_path=None, db_path=None):
+    path = encodings_path or settings.ENCODINGS_PATH
+    try:
+        encodings = recognition.load_encodings(path)
+    except FileNotFoundError:
+        raise SystemExit(f"No encodings file at {path}, generate face encodings in app.py first")
+    if not encodings:
+        raise SystemExit(f"{path} holds no students, generate face encodings in app.py first")
+    service = AttendanceService(encodings, db_path)
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Attendance service for {len(service.matcher)} students listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance ingest service for camera clients")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--encodings", help="Encodings file (defaults to settings.ENCODINGS_PATH)")
+    parser.add_argument("--db", help="Database file (defaults to settings.DB_PATH)")
+    args = parser.parse_args()
+
+    metrics.start()
+    try:
+        asyncio.run(serve(args.host, args.port, args.encodings, args.db))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
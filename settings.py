@@ -0,0 +1,110 @@
+"""Deployment settings for the Attendance Management System.
+
+Every value can be overridden with an environment variable so that each
+kiosk or gate can be tuned without editing the code.
+"""
+import os
+
+# ---------- Paths ----------
+STUDENTS_DIR = os.environ.get("ATTENDANCE_STUDENTS_DIR", "data/students")
+ENCODINGS_PATH = os.environ.get("ATTENDANCE_ENCODINGS_PATH", "encodings/encodings.pkl")
+DB_PATH = os.environ.get("ATTENDANCE_DB_PATH", "database/attendance.db")
+MODELS_DIR = os.environ.get("ATTENDANCE_MODELS_DIR", "models")
+SNAPSHOT_DIR = os.environ.get("ATTENDANCE_SNAPSHOT_DIR", "database/snapshot")
+
+# ---------- Face Detection ----------
+# One of: hog, haar, lbp, yunet, ssd (see detectors.py)
+DETECTOR_BACKEND = os.environ.get("ATTENDANCE_DETECTOR", "hog")
+# Optional model file for the cascade/DNN backends (defaults are picked per backend)
+DETECTOR_MODEL = os.environ.get("ATTENDANCE_DETECTOR_MODEL", "")
+DETECTOR_CONFIDENCE = float(os.environ.get("ATTENDANCE_DETECTOR_CONFIDENCE", "0.6"))
+
+# Comma separated list of camera indexes or stream URLs, e.g. "0,1" or "0,rtsp://gate-2/stream"
+CAMERA_SOURCES = [s.strip() for s in os.environ.get("ATTENDANCE_CAMERAS", "0").split(",") if s.strip()]
+
+# ---------- Frame Preprocessing ----------
+# Capture size requested from the cameras, 0 keeps the camera default
+CAPTURE_WIDTH = int(os.environ.get("ATTENDANCE_CAPTURE_WIDTH", "0"))
+CAPTURE_HEIGHT = int(os.environ.get("ATTENDANCE_CAPTURE_HEIGHT", "0"))
+# Frames are downscaled by this factor before detection and encoding
+PROCESS_SCALE = float(os.environ.get("ATTENDANCE_PROCESS_SCALE", "0.25"))
+# Size of the preview windows relative to the captured frame
+DISPLAY_SCALE = float(os.environ.get("ATTENDANCE_DISPLAY_SCALE", "1.0"))
+
+# ---------- Face Recognition ----------
+TOLERANCE = float(os.environ.get("ATTENDANCE_TOLERANCE", "0.6"))
+
+# Storage of the known encodings: float64 (exact), float16 or int8 (low-memory kiosks)
+MATCH_STORAGE = os.environ.get("ATTENDANCE_MATCH_STORAGE", "float64").lower()
+# Candidates re-checked with an exact distance when the storage is quantized
+MATCH_TOP_K = int(os.environ.get("ATTENDANCE_MATCH_TOP_K", "8"))
+
+# Recognition cache for repeated faces across frames, size 0 disables it
+MATCH_CACHE_SIZE = int(os.environ.get("ATTENDANCE_MATCH_CACHE_SIZE", "256"))
+MATCH_CACHE_TTL = float(os.environ.get("ATTENDANCE_MATCH_CACHE_TTL", "5"))
+MATCH_CACHE_BITS = int(os.environ.get("ATTENDANCE_MATCH_CACHE_BITS", "12"))
+# Cached identities are reused only when closer than TOLERANCE - MARGIN
+MATCH_CACHE_MARGIN = float(os.environ.get("ATTENDANCE_MATCH_CACHE_MARGIN", "0.1"))
+
+# ---------- Liveness ----------
+# Anti-spoof check before marking: off, texture (single frame) or full (texture plus blink/motion).
+# Off until the thresholds below are calibrated on recorded crops (benchmarks/bench_liveness.py --frames-dir)
+LIVENESS_MODE = os.environ.get("ATTENDANCE_LIVENESS", "off").lower()
+# Time per check after which no further tier is started, in milliseconds
+LIVENESS_BUDGET_MS = float(os.environ.get("ATTENDANCE_LIVENESS_BUDGET_MS", "15"))
+# Seconds a face has to show liveness before it is rejected (and then ignored for as long)
+LIVENESS_WINDOW = float(os.environ.get("ATTENDANCE_LIVENESS_WINDOW", "4"))
+# Texture thresholds of the 64x64 grayscale face crop
+LIVENESS_LAPLACIAN_MIN = float(os.environ.get("ATTENDANCE_LIVENESS_LAPLACIAN_MIN", "80"))
+LIVENESS_HF_MIN = float(os.environ.get("ATTENDANCE_LIVENESS_HF_MIN", "0.002"))
+LIVENESS_HF_MAX = float(os.environ.get("ATTENDANCE_LIVENESS_HF_MAX", "0.03"))
+# Non-rigid landmark motion over the last frames that counts as a live face
+LIVENESS_MOTION_MIN = float(os.environ.get("ATTENDANCE_LIVENESS_MOTION_MIN", "0.02"))
+LIVENESS_MOTION_FRAMES = int(os.environ.get("ATTENDANCE_LIVENESS_MOTION_FRAMES", "8"))
+
+# ---------- Metrics ----------
+# Set ATTENDANCE_METRICS=1 to record stage timings and counters
+METRICS_ENABLED = os.environ.get("ATTENDANCE_METRICS", "0").lower() in ("1", "true", "yes")
+METRICS_HOST = os.environ.get("ATTENDANCE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("ATTENDANCE_METRICS_PORT", "9108"))
+# Seconds between JSON snapshots, 0 disables the JSON log
+METRICS_LOG_INTERVAL = float(os.environ.get("ATTENDANCE_METRICS_LOG_INTERVAL", "60"))
+METRICS_LOG_PATH = os.environ.get("ATTENDANCE_METRICS_LOG_PATH", "logs/metrics.jsonl")
+
+# ---------- Ingest Service ----------
+SERVER_HOST = os.environ.get("ATTENDANCE_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("ATTENDANCE_SERVER_PORT", "8765"))
+# Micro-batching: requests arriving within the wait window are matched together
+SERVER_BATCH_SIZE = int(os.environ.get("ATTENDANCE_SERVER_BATCH_SIZE", "64"))
+SERVER_BATCH_WAIT_MS = float(os.environ.get("ATTENDANCE_SERVER_BATCH_WAIT_MS", "2"))
+SERVER_WRITE_INTERVAL_MS = float(os.environ.get("ATTENDANCE_SERVER_WRITE_INTERVAL_MS", "50"))
+
+# ---------- Storage ----------
+# Month-day each term starts on; months before the current term are archived
+TERM_STARTS = [s.strip() for s in os.environ.get("ATTENDANCE_TERM_STARTS", "01-01,07-01").split(",") if s.strip()]
+# Archived terms go to an "archive" folder next to the database unless set
+ARCHIVE_DIR = os.environ.get("ATTENDANCE_ARCHIVE_DIR", "")
+# Set ATTENDANCE_AUTO_ARCHIVE=0 to only archive when run by hand
+AUTO_ARCHIVE = os.environ.get("ATTENDANCE_AUTO_ARCHIVE", "1").lower() in ("1", "true", "yes")
+
+# ---------- Quick Entry ----------
+# Queued attendance rows are written in one transaction every interval
+WRITER_INTERVAL_MS = float(os.environ.get("ATTENDANCE_WRITER_INTERVAL_MS", "50"))
+# A failed write is retried after a delay doubling up to this, in milliseconds
+WRITER_MAX_BACKOFF_MS = float(os.environ.get("ATTENDANCE_WRITER_MAX_BACKOFF_MS", "5000"))
+# Seconds close() keeps retrying before giving up on the rows still queued
+WRITER_CLOSE_TIMEOUT = float(os.environ.get("ATTENDANCE_WRITER_CLOSE_TIMEOUT", "15"))
+
+# ---------- Live Dashboard ----------
+# How often the dashboard applies new events and redraws, in milliseconds
+DASHBOARD_REFRESH_MS = int(os.environ.get("ATTENDANCE_DASHBOARD_REFRESH_MS", "500"))
+
+# ---------- Report Cache ----------
+# Memory bound of the cached report results, 0 disables caching
+REPORT_CACHE_MB = float(os.environ.get("ATTENDANCE_REPORT_CACHE_MB", "64"))
+
+# ---------- Warm Start ----------
+# Set ATTENDANCE_SNAPSHOT=0 to always rebuild the recognition state from the sources at startup
+SNAPSHOT_ENABLED = os.environ.get("ATTENDANCE_SNAPSHOT", "1").lower() in ("1", "true", "yes")
+# Seconds between snapshot writes while the app runs, 0 only writes after a rebuild and on exit
+SNAPSHOT_INTERVAL = float(os.environ.get("ATTENDANCE_SNAPSHOT_INTERVAL", "60"))
@@ -0,0 +1,271 @@
+"""Warm-start snapshot of the recognition state for fast kiosk restarts.
+
+Before the first face can be recognized, app.py needs the face index
+(unpickled encodings turned into the matcher arrays), the integer student
+key of every index row, the roster lookup tables and today's present set.
+WarmState keeps all four and writes them to settings.SNAPSHOT_DIR:
+
+    manifest.json      - a header line with the CRC32 of the rest: names,
+                         student keys, roster rows, present set, the stamps
+                         of the sources and the CRC32 of every array
+    <array>-<crc>.npy  - the matcher's index_arrays(), memory-mapped at boot
+
+Every part records the source state it was built from: the encodings file
+(mtime and size), the students and today's partition write counters in
+attendance_db.data_versions, and the day. refresh() rebuilds only the parts
+whose sources changed, so a corrupt, missing or stale snapshot costs a cold
+start and nothing more. Files are written to a temporary name and renamed,
+and array files are named by their checksum, so a crash while saving leaves
+the previous snapshot intact.
+"""
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+import attendance_db
+import metrics
+import recognition
+import settings
+from roster import Roster
+
+# 2: quantized indexes carry their exact float64 encodings
+FORMAT = 2
+MANIFEST = "manifest.json"
+
+
+def _file_stamp(path):
+    """(mtime_ns, size) of a file, None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _crc32(array):
+    return zlib.crc32(np.ascontiguousarray(array)) & 0xFFFFFFFF
+
+
+def _tuple(value):
+    return tuple(value) if value is not None else None
+
+
+def _replace(path, write):
+    """Write a file under a temporary name and rename it into place"""
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+class SnapshotError(Exception):
+    """The snapshot on disk cannot be used"""
+
+
+class WarmState:
+    """Face index, student keys, roster and present set, kept in sync with their sources"""
+
+    def __init__(self, path=None, encodings_path=None):
+        self.path = path or settings.SNAPSHOT_DIR
+        self.encodings_path = encodings_path or settings.ENCODINGS_PATH
+        self.names = []
+        self.index = None
+        self.storage = None
+        self.index_stamp = None
+        self.student_keys = []
+        self.keys_stamp = None
+        self.roster = Roster()
+        self.roster_version = None
+        self.day = None
+        self.present = set()
+        self.present_version = None
+        self.rebuilt = []
+        self._matcher = None
+        self._saved = None
+        self._verified = set()
+
+    # ---------- Loading ----------
+    @classmethod
+    def load(cls, path=None, encodings_path=None):
+        """State restored from the snapshot, or an empty state (rebuilt by refresh) if it is unusable"""
+        state = cls(path, encodings_path)
+        if not settings.SNAPSHOT_ENABLED or not os.path.exists(os.path.join(state.path, MANIFEST)):
+            return state
+        try:
+            with metrics.timer("snapshot_load"):
+                state._restore()
+        except (SnapshotError, ValueError, KeyError, TypeError, OSError) as e:
+            print(f"Ignoring the warm-start snapshot: {e}")
+            metrics.inc("snapshot_invalid")
+            return cls(path, encodings_path)
+        state._saved = state._signature()
+        return state
+
+    def _restore(self):
+        with open(os.path.join(self.path, MANIFEST), "rb") as f:
+            header, _, data = f.read().partition(b"\n")
+        if json.loads(header)["crc32"] != zlib.crc32(data) & 0xFFFFFFFF:
+            raise SnapshotError("manifest checksum mismatch")
+        body = json.loads(data)
+        if body["format"] != FORMAT:
+            raise SnapshotError(f"format {body['format']} is not {FORMAT}")
+
+        if body["arrays"] is not None:
+            index = {}
+            for name, entry in body["arrays"].items():
+                array = np.load(os.path.join(self.path, entry["file"]), mmap_mode="r", allow_pickle=False)
+                if list(array.shape) != entry["shape"] or _crc32(array) != entry["crc32"]:
+                    raise SnapshotError(f"checksum mismatch in {entry['file']}")
+                index[name] = array
+                self._verified.add(entry["file"])
+            self.index = index
+        self.names = body["names"]
+        self.storage = body["storage"]
+        self.index_stamp = _tuple(body["index_stamp"])
+        self.student_keys = body["student_keys"]
+        keys_stamp = body["keys_stamp"]
+        self.keys_stamp = (_tuple(keys_stamp[0]), keys_stamp[1]) if keys_stamp else None
+        self.roster = Roster(body["roster"])
+        self.roster_version = body["roster_version"]
+        self.day = body["day"]
+        self.present = set(body["present"])
+        self.present_version = body["present_version"]
+
+    # ---------- Rebuilding ----------
+    def refresh(self, conn):
+        """Rebuild whatever is stale against the encodings file and the database, return the rebuilt parts"""
+        self.rebuilt = []
+        stamp = _file_stamp(self.encodings_path)
+        if stamp != self.index_stamp or (stamp is not None and self.storage != settings.MATCH_STORAGE):
+            self._rebuild_index(stamp)
+            self.rebuilt.append("index")
+
+        versions = attendance_db.data_versions(conn)
+        if (stamp, versions.get("students", 0)) != self.keys_stamp or len(self.student_keys) != len(self.names):
+            # Students known only by their folder get registered here
+            self.student_keys = attendance_db.ensure_students(
+                conn, [recognition.split_student_key(name) for name in self.names]) if self.names else []
+            versions = attendance_db.data_versions(conn)
+            self.keys_stamp = (stamp, versions.get("students", 0))
+            self.rebuilt.append("student_keys")
+
+        if versions.get("students", 0) != self.roster_version:
+            self.roster = Roster.load(conn)
+            self.roster_version = versions.get("students", 0)
+            self.rebuilt.append("roster")
+
+        day = attendance_db.day_number()
+        version = versions.get(attendance_db.partition_name(attendance_db.day_string(day)), 0)
+        if (day, version) != (self.day, self.present_version):
+            self.present = attendance_db.present_students(conn, day)
+            self.day, self.present_version = day, version
+            self.rebuilt.append("present")
+
+        for part in self.rebuilt:
+            metrics.inc(f"snapshot_rebuilt_{part}")
+        return self.rebuilt
+
+    def _rebuild_index(self, stamp):
+        self._matcher = None
+        self.storage = settings.MATCH_STORAGE
+        self.index_stamp = stamp
+        if stamp is None:
+            self.names, self.index = [], None
+            return
+        encodings = recognition.load_encodings(self.encodings_path)
+        if not encodings:
+            self.names, self.index = [], None
+            return
+        matcher = recognition.create_matcher(encodings, cache=False)
+        self.names = matcher.names
+        self.index = matcher.index_arrays()
+
+    @property
+    def matcher(self):
+        """Matcher (with the recognition cache) over the current index, None without encodings"""
+        if self._matcher is None and self.index is not None:
+            self._matcher = recognition.matcher_from_index(self.names, self.index)
+        return self._matcher
+
+    # ---------- Present set ----------
+    def is_present(self, conn, student):
+        """Whether the student (integer key) is marked today, reloading the set when the day changes"""
+        day = attendance_db.day_number()
+        if day != self.day:
+            self.present = attendance_db.present_students(conn, day)
+            self.day = day
+            self.present_version = attendance_db.data_versions(conn).get(
+                attendance_db.partition_name(attendance_db.day_string(day)), 0)
+        if student in self.present:
+            return True
+        # Marked by another process (quick entry, ingest service) since the set was loaded
+        if attendance_db.is_marked(conn, student, day):
+            self.present.add(student)
+            return True
+        return False
+
+    def mark(self, student):
+        """Record a student written with attendance_db.mark_present"""
+        self.present.add(student)
+
+    # ---------- Saving ----------
+    def _signature(self):
+        return (self.index_stamp, self.storage, self.keys_stamp, self.roster_version, self.day,
+                self.present_version, len(self.present))
+
+    def save(self, force=False):
+        """Write the snapshot if anything changed since it was loaded or last saved"""
+        if not settings.SNAPSHOT_ENABLED or (not force and self._signature() == self._saved):
+            return False
+        start = time.perf_counter()
+        os.makedirs(self.path, exist_ok=True)
+        arrays = None
+        if self.index is not None:
+            arrays = {}
+            for name, array in self.index.items():
+                crc = _crc32(array)
+                filename = f"{name}-{crc:08x}.npy"
+                # Unchanged arrays were checked when loaded, anything else is (re)written
+                if filename not in self._verified:
+                    _replace(os.path.join(self.path, filename),
+                             lambda f, array=array: np.save(f, np.ascontiguousarray(array), allow_pickle=False))
+                    self._verified.add(filename)
+                arrays[name] = {"file": filename, "crc32": crc, "shape": list(array.shape)}
+        body = {
+            "format": FORMAT,
+            "saved_at": time.time(),
+            "names": self.names,
+            "storage": self.storage,
+            "index_stamp": self.index_stamp,
+            "arrays": arrays,
+            "student_keys": [int(key) for key in self.student_keys],
+            "keys_stamp": self.keys_stamp,
+            "roster": self.roster.rows(),
+            "roster_version": self.roster_version,
+            "day": self.day,
+            "present": sorted(self.present),
+            "present_version": self.present_version,
+        }
+        data = json.dumps(body).encode()
+        header = json.dumps({"crc32": zlib.crc32(data) & 0xFFFFFFFF}).encode()
+        _replace(os.path.join(self.path, MANIFEST), lambda f: f.write(header + b"\n" + data))
+
+        # Array files of earlier indexes are no longer referenced
+        keep = {entry["file"] for entry in (arrays or {}).values()}
+        for filename in os.listdir(self.path):
+            if filename.endswith(".npy") and filename not in keep:
+                os.remove(os.path.join(self.path, filename))
+        self._saved = self._signature()
+        metrics.observe("snapshot_save", time.perf_counter() - start)
+        return True
+
+
+def warm_start(conn, path=None, encodings_path=None):
+    """Load the snapshot, rebuild its stale parts from the sources and save it if anything was rebuilt"""
+    state = WarmState.load(path, encodings_path)
+    state.refresh(conn)
+    state.save()
+    return state
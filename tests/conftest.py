@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_db  # noqa: E402
+import settings  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Path of an empty database in a temporary folder, archives go next to it"""
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", "")
+    return str(tmp_path / "attendance.db")
+
+
+@pytest.fixture
+def conn(db_path):
+    attendance_db.init_db(db_path)
+    conn = attendance_db.connect(db_path)
+    yield conn
+    conn.close()
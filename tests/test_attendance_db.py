@@ -0,0 +1,165 @@
+import sqlite3
+
+import attendance_db
+
+LEGACY_ROWS = [
+    ("S1", "S1_Alice", "2024-01-15", "08:30:00", "Present"),
+    ("S1", "S1_Alice", "2024-01-15", "09:00:00", "Present"),  # Second mark the same day
+    ("S2", "Bob", "2024-02-01", "08:05:10", "Present"),
+    ("S2", "Bob", "not a date", "08:00:00", "Present"),
+    ("S1", "S1_Alice", "2024-02-02", "late", "Present"),
+]
+
+
+def create_legacy_table(path, table):
+    conn = sqlite3.connect(path)
+    conn.execute(f"""CREATE TABLE {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT, name TEXT,
+                                          date TEXT, time TEXT, status TEXT)""")
+    conn.executemany(f"INSERT INTO {table} (student_id, name, date, time, status) VALUES (?, ?, ?, ?, ?)",
+                     LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+
+
+def readable_rows(df):
+    return sorted(df[["student_id", "name", "date", "time"]].itertuples(index=False, name=None))
+
+
+# ---------- Migration ----------
+def test_migrates_single_text_table(db_path):
+    create_legacy_table(db_path, "attendance")
+    attendance_db.init_db(db_path)
+    conn = attendance_db.connect(db_path)
+
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == [
+        ("S1", "Alice", "2024-01-15", "08:30:00"),
+        ("S2", "Bob", "2024-02-01", "08:05:10"),
+    ]
+    assert {"attendance_2024_01", "attendance_2024_02"} <= set(attendance_db.live_partitions(conn))
+    # "<id>_<name>" names from app.py are split into the student's name
+    assert attendance_db.find_student(conn, "S1")[1] == "Alice"
+    conn.close()
+
+
+def test_migration_keeps_the_legacy_table(db_path):
+    create_legacy_table(db_path, "attendance")
+    attendance_db.init_db(db_path)
+    conn = attendance_db.connect(db_path)
+
+    kept = conn.execute("SELECT student_id, date, time FROM attendance_legacy ORDER BY id").fetchall()
+    assert kept == [(student_id, day, time) for student_id, _, day, time, _ in LEGACY_ROWS]
+    # The readable view replaces the old table name
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name='attendance'").fetchone() == ("view",)
+    conn.close()
+
+
+def test_migrates_text_monthly_tables(db_path):
+    create_legacy_table(db_path, "attendance_2024_01")
+    attendance_db.init_db(db_path)
+    conn = attendance_db.connect(db_path)
+
+    assert len(attendance_db.fetch_attendance(conn)) == 2
+    assert "student_id" not in attendance_db._columns(conn, "attendance_2024_01")
+    assert conn.execute("SELECT count(*) FROM attendance_2024_01_legacy").fetchone() == (len(LEGACY_ROWS),)
+    assert "attendance_2024_01_legacy" not in attendance_db.live_partitions(conn)
+    conn.close()
+
+
+def test_migration_runs_once(db_path):
+    create_legacy_table(db_path, "attendance")
+    attendance_db.init_db(db_path)
+    attendance_db.init_db(db_path)
+    conn = attendance_db.connect(db_path)
+    assert len(attendance_db.fetch_attendance(conn)) == 2
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name LIKE 'attendance_legacy%'").fetchone() == (1,)
+    conn.close()
+
+
+# ---------- Partitions ----------
+def test_rows_are_routed_to_their_month(conn):
+    alice, bob = attendance_db.ensure_students(conn, [("S1", "Alice"), ("S2", "Bob")])
+    attendance_db.mark_present_many(conn, [
+        (alice, attendance_db.day_number("2024-01-31"), attendance_db.time_seconds("08:00:00")),
+        (bob, attendance_db.day_number("2024-02-01"), attendance_db.time_seconds("08:01:00")),
+    ])
+
+    assert conn.execute("SELECT student FROM attendance_2024_01").fetchall() == [(alice,)]
+    assert conn.execute("SELECT student FROM attendance_2024_02").fetchall() == [(bob,)]
+    assert attendance_db.is_marked(conn, alice, "2024-01-31")
+    assert not attendance_db.is_marked(conn, alice, "2024-02-01")
+    assert not attendance_db.is_marked(conn, alice, "2023-12-01")  # No partition at all
+
+
+def test_a_student_is_marked_once_per_day(conn):
+    (alice,) = attendance_db.ensure_students(conn, [("S1", "Alice")])
+    attendance_db.mark_present(conn, alice, "2024-03-04", "08:00:00")
+    attendance_db.mark_present(conn, alice, "2024-03-04", "10:00:00")
+    attendance_db.mark_present(conn, alice, "2024-03-05", "08:00:00")
+
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == [
+        ("S1", "Alice", "2024-03-04", "08:00:00"),
+        ("S1", "Alice", "2024-03-05", "08:00:00"),
+    ]
+    assert attendance_db.present_students(conn, "2024-03-04") == {alice}
+
+
+def test_writes_bump_the_partition_version(conn):
+    (alice,) = attendance_db.ensure_students(conn, [("S1", "Alice")])
+    attendance_db.mark_present(conn, alice, "2024-03-04")
+    before = attendance_db.data_versions(conn)["attendance_2024_03"]
+    attendance_db.mark_present(conn, alice, "2024-03-05")
+    assert attendance_db.data_versions(conn)["attendance_2024_03"] > before
+
+
+# ---------- Archive ----------
+def mark_month(conn, students, month, days=3):
+    attendance_db.mark_present_many(conn, [(student, attendance_db.day_number(f"{month}-{day:02d}"), 28800 + student)
+                                           for day in range(1, days + 1) for student in students])
+
+
+def test_archive_moves_old_months_and_keeps_reads(db_path, conn):
+    students = attendance_db.ensure_students(conn, [("S1", "Alice"), ("S2", "Bob")])
+    mark_month(conn, students, "2024-01")
+    mark_month(conn, students, "2024-08")
+    before = readable_rows(attendance_db.fetch_attendance(conn))
+
+    assert attendance_db.archive_old_partitions(db_path, "2024-07-01") == ["attendance_2024_01"]
+    assert attendance_db.archived_partitions(conn) == ["attendance_2024_01"]
+    assert "attendance_2024_01" not in attendance_db.live_partitions(conn)
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == before
+    assert len(attendance_db.fetch_attendance(conn, "2024-07-01")) == 6
+
+
+def test_late_rows_are_merged_into_the_archive(db_path, conn):
+    alice, bob = attendance_db.ensure_students(conn, [("S1", "Alice"), ("S2", "Bob")])
+    mark_month(conn, [alice, bob], "2024-01")
+    attendance_db.archive_old_partitions(db_path, "2024-07-01")
+
+    # A backfilled row and a duplicate of an archived one
+    attendance_db.mark_present(conn, alice, "2024-01-20", "08:00:00")
+    attendance_db.mark_present(conn, bob, "2024-01-01", "12:00:00")
+    expected = sorted(set(readable_rows(attendance_db.fetch_attendance(conn)))
+                      - {("S2", "Bob", "2024-01-01", "12:00:00")})
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == expected
+
+    assert attendance_db.archive_old_partitions(db_path, "2024-07-01") == ["attendance_2024_01"]
+    assert "attendance_2024_01" not in attendance_db.live_partitions(conn)
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == expected
+    assert len(expected) == 7
+
+
+def test_archive_skips_when_the_database_is_busy(db_path, conn, monkeypatch):
+    students = attendance_db.ensure_students(conn, [("S1", "Alice")])
+    mark_month(conn, students, "2024-01")
+    before = readable_rows(attendance_db.fetch_attendance(conn))
+
+    blocker = sqlite3.connect(db_path)
+    blocker.execute("BEGIN IMMEDIATE")
+    monkeypatch.setattr(attendance_db, "connect", lambda path=None: sqlite3.connect(path, timeout=0.1))
+    try:
+        assert attendance_db.archive_old_partitions(db_path, "2024-07-01") == []
+    finally:
+        blocker.rollback()
+        blocker.close()
+    assert "attendance_2024_01" in attendance_db.live_partitions(conn)
+    assert readable_rows(attendance_db.fetch_attendance(conn)) == before